@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RecipeapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipeapi'
+
+    def ready(self):
+        from recipeapi import signals  # noqa: F401  connect signal receivers
@@ -0,0 +1,28 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+
+class AsyncURLConfMiddleware:
+    """Resolve requests served over ASGI with ASYNC_URLCONF.
+
+    That URLconf swaps the async views (recipeapi.views.async_views) in for
+    the recipe and ingredient GET routes. It must be the last middleware:
+    Django hands the innermost one an async `get_response` exactly when the
+    server is ASGI, so under WSGI it is dropped at startup and the sync
+    views keep serving everything.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.urlconf = getattr(settings, "ASYNC_URLCONF", None)
+        if not self.urlconf or not iscoroutinefunction(get_response):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        markcoroutinefunction(self)
+
+    async def __call__(self, request):
+        request.urlconf = self.urlconf
+        return await self.get_response(request)
@@ -0,0 +1,95 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class LocalTokenCache:
+    """Bounded in-process LRU of token key -> (user, token) with a TTL"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > getattr(
+                settings, "TOKEN_AUTH_CACHE_SIZE", 10000
+            ):
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_token_cache = LocalTokenCache()
+
+
+def get_token_cache():
+    """The shared cache named by TOKEN_AUTH_CACHE_ALIAS, else the local LRU"""
+    alias = getattr(settings, "TOKEN_AUTH_CACHE_ALIAS", None)
+    return caches[alias] if alias else local_token_cache
+
+
+def cache_key(token_key):
+    return f"auth-token:{token_key}"
+
+
+def forget_token(token_key):
+    get_token_cache().delete(cache_key(token_key))
+
+
+def forget_user(user_id):
+    for token_key in Token.objects.filter(user_id=user_id).values_list(
+        "key", flat=True
+    ):
+        forget_token(token_key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that skips the Token/User query for recently seen tokens.
+
+    Entries are dropped when their Token or User is saved or deleted (see
+    recipeapi.signals) and expire after TOKEN_AUTH_CACHE_TTL seconds. With the
+    default in-process cache, that TTL is how long a revocation made in one
+    worker can take to reach the others. Set TOKEN_AUTH_CACHE_ALIAS to a
+    shared cache to make revocation immediate everywhere.
+
+    The in-process cache holds one User object per token, so each request
+    gets its own copy; changes a view makes to request.user stay with it.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        cached = cache.get(cache_key(key))
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            cache.set(
+                cache_key(key), cached, getattr(settings, "TOKEN_AUTH_CACHE_TTL", 60)
+            )
+        user, token = cached
+        return copy.copy(user), token
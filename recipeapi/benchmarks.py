@@ -0,0 +1,421 @@
+import functools
+import json
+import threading
+import time
+import uuid
+from collections import namedtuple
+from io import BytesIO
+
+from PIL import Image
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from recipeapi.models import Ingredient, Recipe, RecipePicture
+
+# build(context) -> (path, payload); payload is None, a JSON-able object,
+# or {"image": bytes} for a multipart upload. It runs before the clock starts,
+# so it may also create the rows a destructive request consumes.
+Route = namedtuple("Route", ["name", "method", "build", "writes"])
+
+
+class BenchmarkContext:
+    """The user a benchmark runs as, plus ids its requests can point at"""
+
+    def __init__(self, user, password, rng):
+        self.user = user
+        self.password = password
+        self.token = Token.objects.get_or_create(user=user)[0].key
+        self.own_recipe_ids = list(
+            Recipe.objects.filter(user=user).values_list("id", flat=True)[:1000]
+        )
+        self.recipe_ids = list(
+            Recipe.objects.order_by("?").values_list("id", flat=True)[:1000]
+        )
+        self.ingredient_ids = list(
+            Ingredient.objects.order_by("?").values_list("id", flat=True)[:1000]
+        )
+        self.ingredient_names = list(
+            Ingredient.objects.filter(pk__in=self.ingredient_ids).values_list(
+                "name", flat=True
+            )
+        )
+        self.picture_ids = list(
+            RecipePicture.objects.exclude(image="")
+            .filter(status=RecipePicture.READY)
+            .values_list("id", flat=True)[:1000]
+        )
+        buffer = BytesIO()
+        Image.new("RGB", (800, 600), (200, 120, 40)).save(buffer, "JPEG")
+        self.image = buffer.getvalue()
+        self.rng = rng
+
+    @classmethod
+    def for_busiest_user(cls, password, rng):
+        """Run as the user owning the most recipes, so owner-only routes have data"""
+        user = (
+            User.objects.annotate(total=Count("recipes"))
+            .order_by("-total", "id")
+            .first()
+        )
+        return cls(user, password, rng) if user else None
+
+    def pick(self, ids):
+        return self.rng.choice(ids) if ids else 0
+
+    def words(self, count=2):
+        names = self.ingredient_names or ["salt"]
+        return [self.rng.choice(names) for _ in range(count)]
+
+    def scratch_recipe(self):
+        recipe = Recipe.objects.create(user=self.user, description="Benchmark scratch")
+        return recipe.id
+
+
+def unique(prefix):
+    return f"{prefix}-{uuid.uuid4().hex[:12]}"
+
+
+ROUTES = [
+    # RecipeView
+    Route("recipes.list", "GET", lambda c: ("/recipes", None), False),
+    Route(
+        "recipes.retrieve",
+        "GET",
+        lambda c: (f"/recipes/{c.pick(c.own_recipe_ids)}", None),
+        False,
+    ),
+    Route("recipes.my_recipes", "GET", lambda c: ("/recipes/my-recipes", None), False),
+    Route("recipes.favorites", "GET", lambda c: ("/recipes/favorites", None), False),
+    Route(
+        "recipes.search",
+        "GET",
+        lambda c: (f"/recipes/search?q={c.words(1)[0].split()[-1]}", None),
+        False,
+    ),
+    Route(
+        "recipes.by_ingredients",
+        "GET",
+        lambda c: (
+            "/recipes/by-ingredients?ingredients="
+            + ",".join(str(c.pick(c.ingredient_ids)) for _ in range(8)),
+            None,
+        ),
+        False,
+    ),
+    Route(
+        "recipes.similar",
+        "GET",
+        lambda c: (f"/recipes/{c.pick(c.recipe_ids)}/similar", None),
+        False,
+    ),
+    Route(
+        "recipes.picture_variant",
+        "GET",
+        lambda c: (
+            f"/recipes/pictures/{c.pick(c.picture_ids)}/"
+            f"{c.rng.choice([160, 480, 1080])}.{c.rng.choice(['webp', 'jpg'])}",
+            None,
+        ),
+        False,
+    ),
+    Route(
+        "recipes.create",
+        "POST",
+        lambda c: (
+            "/recipes",
+            {
+                "description": unique("Benchmark recipe"),
+                "summary": "Created by benchmark_endpoints",
+                "ingredients": [{"name": name} for name in c.words(5)],
+            },
+        ),
+        True,
+    ),
+    Route(
+        "recipes.update",
+        "PUT",
+        lambda c: (
+            f"/recipes/{c.pick(c.own_recipe_ids)}",
+            {
+                "description": unique("Benchmark update"),
+                "ingredients": [c.pick(c.ingredient_ids) for _ in range(5)],
+            },
+        ),
+        True,
+    ),
+    Route(
+        "recipes.destroy",
+        "DELETE",
+        lambda c: (f"/recipes/{c.scratch_recipe()}", None),
+        True,
+    ),
+    Route(
+        "recipes.favorite",
+        "POST",
+        lambda c: (f"/recipes/{c.pick(c.recipe_ids)}/favorite", None),
+        True,
+    ),
+    Route(
+        "recipes.favorite_batch",
+        "POST",
+        lambda c: (
+            "/recipes/favorites/batch",
+            {"add": c.rng.sample(c.recipe_ids, min(10, len(c.recipe_ids)))},
+        ),
+        True,
+    ),
+    Route(
+        "recipes.bulk",
+        "POST",
+        lambda c: (
+            "/recipes/bulk",
+            [
+                {"description": unique("Bulk recipe"), "ingredients": c.words(4)}
+                for _ in range(20)
+            ],
+        ),
+        True,
+    ),
+    Route(
+        "recipes.upload_picture",
+        "POST",
+        lambda c: (f"/recipes/{c.scratch_recipe()}/pictures", {"image": c.image}),
+        True,
+    ),
+    # IngredientView
+    Route("ingredients.list", "GET", lambda c: ("/ingredients", None), False),
+    Route(
+        "ingredients.retrieve",
+        "GET",
+        lambda c: (f"/ingredients/{c.pick(c.ingredient_ids)}", None),
+        False,
+    ),
+    Route(
+        "ingredients.search",
+        "GET",
+        lambda c: (f"/ingredients/search?q={c.words(1)[0][:3]}", None),
+        False,
+    ),
+    Route(
+        "ingredients.create",
+        "POST",
+        lambda c: ("/ingredients", {"name": unique("benchmark ingredient")}),
+        True,
+    ),
+    Route(
+        "ingredients.update",
+        "PUT",
+        lambda c: (
+            f"/ingredients/{Ingredient.objects.create(name=unique('scratch')).id}",
+            {"name": unique("renamed")},
+        ),
+        True,
+    ),
+    Route(
+        "ingredients.destroy",
+        "DELETE",
+        lambda c: (
+            f"/ingredients/{Ingredient.objects.create(name=unique('scratch')).id}",
+            None,
+        ),
+        True,
+    ),
+    # UserViewSet
+    Route(
+        "users.login",
+        "POST",
+        lambda c: ("/login", {"username": c.user.username, "password": c.password}),
+        False,
+    ),
+    Route(
+        "users.register",
+        "POST",
+        lambda c: (
+            "/register",
+            {
+                "username": unique("benchmark"),
+                "password": "benchmark",
+                "first_name": "Bench",
+                "last_name": "Mark",
+            },
+        ),
+        True,
+    ),
+]
+
+
+class TestClientTransport:
+    """Sends requests in-process through the full Django stack"""
+
+    counts_queries = True
+
+    def __init__(self, token, host):
+        self.client = Client(
+            SERVER_NAME=host,
+            HTTP_AUTHORIZATION=f"Token {token}",
+            raise_request_exception=False,
+        )
+
+    def send(self, method, path, payload):
+        if isinstance(payload, dict) and isinstance(payload.get("image"), bytes):
+            upload = SimpleUploadedFile("bench.jpg", payload["image"], "image/jpeg")
+            return self.client.post(path, {"image": upload}).status_code
+        body = None if payload is None else json.dumps(payload)
+        return self.client.generic(
+            method, path, body or "", content_type="application/json"
+        ).status_code
+
+    def close(self):
+        connection.close()
+
+
+class HTTPTransport:
+    """Sends requests to a running server, e.g. one started with runserver"""
+
+    counts_queries = False
+
+    def __init__(self, token, base_url):
+        import requests
+
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Token {token}"
+
+    def send(self, method, path, payload):
+        url = self.base_url + path
+        if isinstance(payload, dict) and isinstance(payload.get("image"), bytes):
+            files = {"image": ("bench.jpg", payload["image"], "image/jpeg")}
+            return self.session.post(url, files=files).status_code
+        return self.session.request(method, url, json=payload).status_code
+
+    def close(self):
+        self.session.close()
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_route(route, context, make_transport, requests, concurrency, warmup):
+    """Time `requests` calls of one route spread over `concurrency` threads"""
+    # requests are built up front so set-up work stays off the clock
+    planned = [route.build(context) for _ in range(warmup + requests)]
+    warm, planned = planned[:warmup], planned[warmup:]
+    timings, queries, statuses = [], [], []
+    lock = threading.Lock()
+
+    def worker(share):
+        transport = make_transport()
+        try:
+            for path, payload in share:
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    status = transport.send(route.method, path, payload)
+                    elapsed = time.perf_counter() - started
+                with lock:
+                    timings.append(elapsed)
+                    statuses.append(status)
+                    if transport.counts_queries:
+                        queries.append(len(captured.captured_queries))
+        finally:
+            if concurrency > 1:
+                transport.close()
+
+    transport = make_transport()
+    for path, payload in warm:
+        transport.send(route.method, path, payload)
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        worker(planned)  # stay on this thread (and its connection and transaction)
+    else:
+        threads = [
+            threading.Thread(target=worker, args=(planned[i::concurrency],))
+            for i in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - started
+
+    timings.sort()
+    return {
+        "requests": len(timings),
+        "errors": sum(1 for status in statuses if status >= 400),
+        "p50_ms": percentile(timings, 0.5) * 1e3,
+        "p95_ms": percentile(timings, 0.95) * 1e3,
+        "p99_ms": percentile(timings, 0.99) * 1e3,
+        "throughput_rps": len(timings) / wall if wall else 0.0,
+        "queries_per_request": sum(queries) / len(queries) if queries else None,
+    }
+
+
+def run_benchmark(
+    routes,
+    context,
+    requests=100,
+    concurrency=1,
+    warmup=5,
+    base_url=None,
+    host="localhost",
+    progress=None,
+):
+    """Benchmark each route in turn and return {route name: stats}"""
+    if base_url:
+        make_transport = functools.partial(HTTPTransport, context.token, base_url)
+    else:
+        make_transport = functools.partial(TestClientTransport, context.token, host)
+
+    results = {}
+    for route in routes:
+        results[route.name] = run_route(
+            route, context, make_transport, requests, concurrency, warmup
+        )
+        if progress:
+            progress(route.name, results[route.name])
+    return results
+
+
+def compare(results, baseline, threshold=0.1):
+    """Regressions against a saved baseline.
+
+    A route regresses when its p95 grows by more than `threshold` (a
+    fraction), its throughput drops by more than `threshold`, or it issues
+    more queries per request. Returns (route, description) pairs.
+    """
+    regressions = []
+    for name, now in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if now["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(
+                (name, f"p95 {before['p95_ms']:.2f} -> {now['p95_ms']:.2f} ms")
+            )
+        if now["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                (
+                    name,
+                    f"throughput {before['throughput_rps']:.1f} -> "
+                    f"{now['throughput_rps']:.1f} req/s",
+                )
+            )
+        if (
+            now["queries_per_request"] is not None
+            and before["queries_per_request"] is not None
+            and now["queries_per_request"] > before["queries_per_request"]
+        ):
+            regressions.append(
+                (
+                    name,
+                    f"queries {before['queries_per_request']:.1f} -> "
+                    f"{now['queries_per_request']:.1f} per request",
+                )
+            )
+    return regressions
@@ -0,0 +1,107 @@
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+_replica_reads = contextvars.ContextVar("replica_reads", default=False)
+
+
+def replica_aliases():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+def reading_from_replica():
+    """Whether ORM reads in the current request may be served by a replica"""
+    return _replica_reads.get() and bool(replica_aliases())
+
+
+def pin_key(user_id):
+    return f"db-pin:{user_id}"
+
+
+def pin_to_primary(user):
+    """Send `user`'s reads to the primary until replicas have caught up"""
+    window = getattr(settings, "READ_YOUR_WRITES_WINDOW", 5)
+    caches["default"].set(pin_key(user.pk), True, window)
+
+
+def is_pinned(user):
+    return user.is_authenticated and bool(caches["default"].get(pin_key(user.pk)))
+
+
+async def ais_pinned(user):
+    if not user.is_authenticated:
+        return False
+    return bool(await caches["default"].aget(pin_key(user.pk)))
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Let ORM reads inside the block go to replicas"""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """Route reads to DATABASE_REPLICAS while a view allows it.
+
+    Reads go to a random replica only inside an action that
+    ReplicaReadsMixin marked as replica-safe; everything else, and every
+    write, goes to the primary. Replicas are copies of the primary, so
+    migrations only run there.
+    """
+
+    def db_for_read(self, model, **hints):
+        if reading_from_replica():
+            return random.choice(replica_aliases())
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replica_aliases()
+
+
+class ReplicaReadsMixin:
+    """Serve the ViewSet's `replica_actions` from read replicas.
+
+    A GET to one of those actions reads from a replica unless the user wrote
+    something in the last READ_YOUR_WRITES_WINDOW seconds, in which case it
+    reads the primary so the user sees their own change. Any successful
+    write request starts that window.
+    """
+
+    replica_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)  # authenticates on the primary
+        if (
+            self.action in self.replica_actions
+            and request.method in SAFE_METHODS
+            and not is_pinned(request.user)
+        ):
+            self._replica_reads = _replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, "_replica_reads", None)
+        if token is not None:
+            _replica_reads.reset(token)
+            self._replica_reads = None
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and request.user.is_authenticated
+        ):
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
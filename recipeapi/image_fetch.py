@@ -0,0 +1,82 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class ImageFetchError(Exception):
+    pass
+
+
+_lock = threading.Lock()
+_session = None
+_executor = None
+
+
+def get_session():
+    """Shared keep-alive session so repeat hosts reuse pooled connections"""
+    global _session
+    with _lock:
+        if _session is None:
+            workers = _setting("IMAGE_FETCH_WORKERS", 8)
+            adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+            _session = requests.Session()
+            _session.headers["User-Agent"] = "Mozilla/5.0"
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def get_executor():
+    """Process-wide worker pool, bounding concurrent downloads across requests"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_setting("IMAGE_FETCH_WORKERS", 8),
+                thread_name_prefix="image-fetch",
+            )
+        return _executor
+
+
+def fetch_image(url):
+    """Download one image, streaming it in chunks.
+
+    Raises ImageFetchError if the body is larger than IMAGE_FETCH_MAX_BYTES or
+    the download takes longer than IMAGE_FETCH_TOTAL_TIMEOUT, which a server
+    trickling bytes under the per-read timeout could otherwise stretch
+    without end.
+    """
+    max_bytes = _setting("IMAGE_FETCH_MAX_BYTES", 10 * 1024 * 1024)
+    total = _setting("IMAGE_FETCH_TOTAL_TIMEOUT", 15)
+    deadline = time.monotonic() + total
+    timeout = min(_setting("IMAGE_FETCH_TIMEOUT", 5), total)
+
+    try:
+        with get_session().get(url, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            declared = response.headers.get("Content-Length")
+            if declared and declared.isdigit() and int(declared) > max_bytes:
+                raise ImageFetchError(f"{url} is {declared} bytes, over the limit")
+
+            chunks = []
+            received = 0
+            for chunk in response.iter_content(CHUNK_SIZE):
+                received += len(chunk)
+                if received > max_bytes:
+                    raise ImageFetchError(f"{url} is over {max_bytes} bytes")
+                if time.monotonic() > deadline:
+                    raise ImageFetchError(f"{url} ran past the download budget")
+                chunks.append(chunk)
+            return b"".join(chunks)
+    except requests.exceptions.RequestException as e:
+        raise ImageFetchError(str(e)) from e
@@ -0,0 +1,144 @@
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from django.utils import timezone
+
+from recipeapi.image_fetch import ImageFetchError, fetch_image, get_executor
+from recipeapi.models import ImageIngestJob, RecipePicture
+from recipeapi.response_cache import invalidate_recipes
+
+logger = logging.getLogger(__name__)
+
+
+def image_file_name(recipe_id, image_url):
+    ext = image_url.split(".")[-1].lower()
+    if ext not in ["jpg", "jpeg", "png", "gif"]:
+        ext = "jpg"
+    return f"{recipe_id}-{uuid.uuid4()}.{ext}"
+
+
+def enqueue_images(recipe, image_urls):
+    """Create a pending picture slot and an ingest job for each url"""
+    pictures = RecipePicture.objects.bulk_create(
+        [RecipePicture(recipe=recipe, status=RecipePicture.PENDING) for _ in image_urls]
+    )
+    ImageIngestJob.objects.bulk_create(
+        [
+            ImageIngestJob(picture=picture, url=url)
+            for picture, url in zip(pictures, image_urls)
+        ]
+    )
+    return pictures
+
+
+def claim_jobs(limit):
+    """Mark up to `limit` due jobs as running and return them.
+
+    Jobs stuck in running longer than IMAGE_JOB_LOCK_TIMEOUT (a crashed
+    worker) are claimed again. The conditional UPDATE makes each claim
+    atomic, so several workers can share the queue.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, "IMAGE_JOB_LOCK_TIMEOUT", 300))
+    due = (
+        ImageIngestJob.objects.filter(
+            Q(status=ImageIngestJob.PENDING, run_after__lte=now)
+            | Q(status=ImageIngestJob.RUNNING, locked_at__lt=stale)
+        )
+        .select_related("picture")
+        .order_by("run_after")
+    )
+
+    claimed = []
+    for job in due[:limit]:
+        updated = ImageIngestJob.objects.filter(
+            pk=job.pk, status=job.status, locked_at=job.locked_at
+        ).update(status=ImageIngestJob.RUNNING, locked_at=now)
+        if updated:
+            job.status = ImageIngestJob.RUNNING
+            job.locked_at = now
+            claimed.append(job)
+    return claimed
+
+
+def save_job(job, fields):
+    """Write `fields` of `job` back, unless the job was deleted with its picture"""
+    ImageIngestJob.objects.filter(pk=job.pk).update(
+        **{field: getattr(job, field) for field in fields}
+    )
+
+
+def complete_job(job, image_content):
+    """Store a downloaded image on the job's picture.
+
+    The picture can be deleted while the download runs (a recipe update
+    replaces all its pictures, and deleting the recipe cascades), so the
+    row is filled in with a conditional UPDATE: save() would insert it
+    again. Returns False, releasing the stored file, if the picture is gone.
+    """
+    picture = job.picture
+    file_name = image_file_name(picture.recipe_id, job.url)
+    content = ContentFile(image_content)
+    picture.image.save(file_name, content, save=False)
+    updated = RecipePicture.objects.filter(
+        pk=picture.pk, status=RecipePicture.PENDING
+    ).update(image=picture.image.name, status=RecipePicture.READY)
+    if not updated:
+        RecipePicture.release_image(picture.image.name)
+        return False
+    # as RecipePicture.save() does; update() bypasses it
+    picture.image.storage.restore(picture.image.name, content)
+    # update() sends no post_save, so expire the cached recipe here
+    invalidate_recipes([picture.recipe_id])
+    job.status = ImageIngestJob.DONE
+    job.attempts += 1
+    job.last_error = ""
+    save_job(job, ["status", "attempts", "last_error"])
+    return True
+
+
+def fail_job(job, error):
+    """Schedule a retry with exponential backoff, or give up after max attempts"""
+    job.attempts += 1
+    job.last_error = str(error)
+    job.locked_at = None
+    if job.attempts >= getattr(settings, "IMAGE_JOB_MAX_ATTEMPTS", 5):
+        job.status = ImageIngestJob.FAILED
+        failed = RecipePicture.objects.filter(
+            pk=job.picture_id, status=RecipePicture.PENDING
+        ).update(status=RecipePicture.FAILED)
+        if failed:
+            # update() sends no post_save, so expire the cached recipe here
+            invalidate_recipes([job.picture.recipe_id])
+        logger.warning("Giving up on image %s: %s", job.url, error)
+    else:
+        base = getattr(settings, "IMAGE_JOB_RETRY_DELAY", 30)
+        job.status = ImageIngestJob.PENDING
+        job.run_after = timezone.now() + timedelta(
+            seconds=base * 2 ** (job.attempts - 1)
+        )
+    save_job(job, ["attempts", "last_error", "locked_at", "status", "run_after"])
+
+
+def run_pending_jobs(limit=20):
+    """Claim and process one batch of jobs, returning how many were handled.
+
+    Downloads run on the shared fetch pool; database writes stay on this
+    thread.
+    """
+    jobs = claim_jobs(limit)
+    futures = [(job, get_executor().submit(fetch_image, job.url)) for job in jobs]
+    for job, future in futures:
+        try:
+            complete_job(job, future.result())
+        except ImageFetchError as e:
+            fail_job(job, e)
+        except Exception as e:
+            # one broken job must not stop the rest of the batch
+            logger.exception("Image job %s failed", job.pk)
+            fail_job(job, e)
+    return len(jobs)
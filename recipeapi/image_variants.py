@@ -0,0 +1,57 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+VARIANT_WIDTHS = (160, 480, 1080)
+VARIANT_FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+VARIANT_QUALITY = 80
+
+
+class UnreadableImage(Exception):
+    """The original of a picture is missing or cannot be decoded"""
+
+
+def variant_name(image_name, width, fmt):
+    """Storage name of a derivative, keyed on the original file name"""
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f"recipe_variants/{stem}-{width}.{fmt}"
+
+
+def delete_variants(image_name):
+    for width in VARIANT_WIDTHS:
+        for fmt in VARIANT_FORMATS:
+            default_storage.delete(variant_name(image_name, width, fmt))
+
+
+def render_variant(source, width, fmt):
+    """Scale `source` down to `width` pixels wide and encode it as `fmt`"""
+    with Image.open(source) as original:
+        img = ImageOps.exif_transpose(original)
+        if img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.LANCZOS)
+        if fmt == "jpg" and img.mode != "RGB":
+            img = img.convert("RGB")
+        elif img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA")
+        buffer = BytesIO()
+        img.save(buffer, VARIANT_FORMATS[fmt], quality=VARIANT_QUALITY)
+    return buffer.getvalue()
+
+
+def get_or_create_variant(picture, width, fmt):
+    """Return the storage name of the variant, rendering it on first request"""
+    name = variant_name(picture.image.name, width, fmt)
+    if not default_storage.exists(name):
+        try:
+            with picture.image.open("rb") as source:
+                content = render_variant(source, width, fmt)
+        except (OSError, Image.DecompressionBombError) as e:
+            # OSError covers a missing file and PIL's UnidentifiedImageError
+            raise UnreadableImage(picture.image.name) from e
+        if not default_storage.exists(name):  # another request may have won
+            default_storage.save(name, ContentFile(content))
+    return name
@@ -0,0 +1,148 @@
+from bisect import bisect_left, insort
+
+from recipeapi.models.ingredient import Ingredient, normalize_name
+from recipeapi.rebuilding_index import RebuildingIndex
+
+
+def trigrams(key):
+    return {key[i : i + 3] for i in range(len(key) - 2)}
+
+
+class IngredientIndex(RebuildingIndex):
+    """In-process type-ahead index over ingredient names.
+
+    Holds two sorted arrays searched with bisect: whole normalized names (for
+    prefix matches) and every later word in each name (so "pep" finds "black
+    pepper"). A trigram index answers mid-word substrings when the prefix
+    tiers leave room. Results are ranked exact, name prefix, word prefix,
+    substring; each tier is alphabetical.
+
+    Prefix tiers cost a bisect plus `limit` steps. The substring tier walks
+    the rarest trigram's postings, which are kept in name order, and stops as
+    soon as the remaining slots are filled.
+
+    Saves and deletes in this process update the index through signals.
+    Changes made by bulk inserts or by other processes show up once the index
+    is older than INGREDIENT_INDEX_TTL seconds and has been rebuilt in the
+    background.
+    """
+
+    tables = ("_names", "_keys", "_prefixes", "_words", "_trigrams")
+    ttl_setting = "INGREDIENT_INDEX_TTL"
+
+    def __init__(self):
+        super().__init__()
+        self._names = {}
+        self._keys = {}
+        self._prefixes = []
+        self._words = []
+        self._trigrams = {}
+
+    def rows(self):
+        return Ingredient.objects.values_list("id", "name").iterator()
+
+    def load(self, ingredients):
+        prefixes, words = [], []
+        for pk, name in ingredients:
+            key = self._store(pk, name)
+            prefixes.append((key, pk))
+            words.extend((word, pk) for word in self._later_words(key))
+            for gram in trigrams(key):
+                self._trigrams.setdefault(gram, []).append((key, pk))
+        self._prefixes = sorted(prefixes)
+        self._words = sorted(words)
+        for posting in self._trigrams.values():
+            posting.sort()
+
+    def add(self, pk, name):
+        with self._lock:
+            self._record(self.add, pk, name)
+            if self._built_at is None:
+                return
+            self._unindex(pk)
+            key = self._store(pk, name)
+            insort(self._prefixes, (key, pk))
+            for word in self._later_words(key):
+                insort(self._words, (word, pk))
+            for gram in trigrams(key):
+                insort(self._trigrams.setdefault(gram, []), (key, pk))
+
+    def remove(self, pk):
+        with self._lock:
+            self._record(self.remove, pk)
+            if self._built_at is not None:
+                self._unindex(pk)
+
+    def search(self, query, limit=10):
+        """Return up to `limit` (id, name) pairs matching `query`"""
+        query = normalize_name(query)
+        if not query:
+            return []
+        self.refresh()
+        with self._lock:
+            exact, prefix = [], []
+            for key, pk in self._scan(self._prefixes, query, limit):
+                (exact if key == query else prefix).append(pk)
+            ranked = exact + prefix
+            seen = set(ranked)
+            if len(ranked) < limit:
+                for _, pk in self._scan(self._words, query, limit):
+                    if pk not in seen:
+                        seen.add(pk)
+                        ranked.append(pk)
+            if len(ranked) < limit and len(query) >= 3:
+                # substring matches only fill the remaining slots, so stop
+                # verifying candidates as soon as there are enough
+                for key, pk in self._rarest_posting(query):
+                    if pk not in seen and query in key:
+                        ranked.append(pk)
+                        if len(ranked) == limit:
+                            break
+            return [(pk, self._names[pk]) for pk in ranked[:limit]]
+
+    def _store(self, pk, name):
+        key = normalize_name(name)
+        self._names[pk] = name
+        self._keys[pk] = key
+        return key
+
+    def _unindex(self, pk):
+        if pk not in self._names:
+            return
+        del self._names[pk]
+        key = self._keys.pop(pk)
+        self._discard(self._prefixes, (key, pk))
+        for word in self._later_words(key):
+            self._discard(self._words, (word, pk))
+        for gram in trigrams(key):
+            self._discard(self._trigrams[gram], (key, pk))
+
+    def _rarest_posting(self, query):
+        """(key, id) pairs, in name order, of the query's least common trigram.
+
+        Every substring match holds all of the query's trigrams, so this
+        posting contains them all.
+        """
+        return min((self._trigrams.get(gram, []) for gram in trigrams(query)), key=len)
+
+    @staticmethod
+    def _later_words(key):
+        words = key.split(" ")
+        return {" ".join(words[i:]) for i in range(1, len(words))}
+
+    @staticmethod
+    def _scan(entries, query, limit):
+        start = bisect_left(entries, (query,))
+        for key, pk in entries[start : start + limit]:
+            if not key.startswith(query):
+                break
+            yield key, pk
+
+    @staticmethod
+    def _discard(entries, entry):
+        i = bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+
+
+ingredient_index = IngredientIndex()
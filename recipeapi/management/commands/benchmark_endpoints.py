@@ -0,0 +1,110 @@
+import json
+import logging
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipeapi.benchmarks import ROUTES, BenchmarkContext, compare, run_benchmark
+from recipeapi.synthetic import PASSWORD
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test every API route and report latency percentiles, throughput "
+        "and queries per request. Write routes change the data, so run it "
+        "against a throwaway catalog such as one from generate_catalog."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=100, help="Per route")
+        parser.add_argument("--concurrency", type=int, default=1)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument(
+            "--routes", help="Comma-separated route names or prefixes, e.g. recipes."
+        )
+        parser.add_argument("--read-only", action="store_true")
+        parser.add_argument(
+            "--url", help="Benchmark a running server instead of the test client"
+        )
+        parser.add_argument("--host", default="localhost")
+        parser.add_argument(
+            "--password", default=PASSWORD, help="Password of the benchmark user"
+        )
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--save", help="Write the results to this JSON file")
+        parser.add_argument("--baseline", help="Compare against a saved JSON file")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=10.0,
+            help="Percent change that counts as a regression",
+        )
+        parser.add_argument("--fail-on-regression", action="store_true")
+
+    def handle(self, *args, **options):
+        routes = ROUTES
+        if options["routes"]:
+            prefixes = [name.strip() for name in options["routes"].split(",")]
+            routes = [r for r in routes if r.name.startswith(tuple(prefixes))]
+        if options["read_only"]:
+            routes = [r for r in routes if not r.writes]
+        if not routes:
+            raise CommandError("No routes selected")
+
+        context = BenchmarkContext.for_busiest_user(
+            options["password"], random.Random(options["seed"])
+        )
+        if context is None:
+            raise CommandError("No users to run as; try generate_catalog first")
+
+        self.stdout.write(
+            f"{'route':<28}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'req/s':>9}{'queries':>9}{'errors':>8}"
+        )
+
+        def report(name, stats):
+            queries = stats["queries_per_request"]
+            self.stdout.write(
+                f"{name:<28}{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}"
+                f"{stats['p99_ms']:>9.2f}{stats['throughput_rps']:>9.1f}"
+                f"{'-' if queries is None else f'{queries:.1f}':>9}"
+                f"{stats['errors']:>8}"
+            )
+
+        # expected 4xx answers would otherwise log a warning per request
+        logging.getLogger("django.request").setLevel(logging.ERROR)
+        results = run_benchmark(
+            routes,
+            context,
+            requests=options["requests"],
+            concurrency=options["concurrency"],
+            warmup=options["warmup"],
+            base_url=options["url"],
+            host=options["host"],
+            progress=report,
+        )
+
+        run = {key: options[key] for key in ("requests", "concurrency", "url")}
+        if options["save"]:
+            with open(options["save"], "w") as out:
+                json.dump({"run": run, "routes": results}, out, indent=2)
+            self.stdout.write(f"Saved results to {options['save']}")
+
+        if options["baseline"]:
+            with open(options["baseline"]) as saved:
+                baseline = json.load(saved)
+            if baseline["run"] != run:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"Baseline was run with {baseline['run']}, not {run}"
+                    )
+                )
+            regressions = compare(
+                results, baseline["routes"], options["threshold"] / 100
+            )
+            for name, change in regressions:
+                self.stdout.write(self.style.WARNING(f"Regression in {name}: {change}"))
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
+            elif options["fail_on_regression"]:
+                raise CommandError(f"{len(regressions)} regression(s)")
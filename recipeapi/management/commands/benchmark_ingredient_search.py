@@ -0,0 +1,71 @@
+import itertools
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipeapi.ingredient_index import IngredientIndex
+
+WORDS = [
+    "black", "white", "red", "green", "smoked", "sweet", "dried", "fresh",
+    "pepper", "salt", "onion", "garlic", "basil", "thyme", "butter", "flour",
+    "sugar", "rice", "bean", "chili", "lemon", "lime", "ginger", "honey",
+    "paprika", "cumin", "oregano", "tomato", "potato", "carrot", "celery",
+]  # fmt: skip
+
+
+class Command(BaseCommand):
+    help = "Time IngredientIndex.search against a synthetic in-memory catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ingredients", type=int, default=100_000)
+        parser.add_argument("--queries", type=int, default=5_000)
+        parser.add_argument("--limit", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        names = [
+            f"{' '.join(rng.sample(WORDS, rng.randint(1, 3)))} {i}"
+            for i in range(options["ingredients"])
+        ]
+        index = IngredientIndex()
+        started = time.perf_counter()
+        index.rebuild(enumerate(names, start=1))
+        self.stdout.write(
+            f"Indexed {len(names)} names in {time.perf_counter() - started:.2f}s"
+        )
+
+        queries = [
+            rng.choice(WORDS)[: rng.randint(1, 6)] for _ in range(options["queries"])
+        ] + [rng.choice(WORDS)[1:5] for _ in range(options["queries"] // 10)]
+        self.report("steady", self.time_queries(index, queries, options["limit"]))
+
+        # searches keep using the old tables while a rebuild runs
+        rebuild = threading.Thread(
+            target=index.rebuild, args=(list(enumerate(names, start=1)),)
+        )
+        rebuild.start()
+        timings, replay = [], itertools.cycle(queries)
+        while True:  # at least one batch, however quick the rebuild
+            batch = itertools.islice(replay, 100)
+            timings.extend(self.time_queries(index, batch, options["limit"]))
+            if not rebuild.is_alive():
+                break
+        rebuild.join()
+        self.report("rebuild", timings)
+
+    def time_queries(self, index, queries, limit):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, limit)
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    def report(self, phase, timings):
+        timings.sort()
+        for label, fraction in [("p50", 0.5), ("p95", 0.95), ("p99", 0.99)]:
+            value = timings[min(len(timings) - 1, int(len(timings) * fraction))]
+            self.stdout.write(f"{phase} {label}: {value * 1e6:.0f} us")
@@ -0,0 +1,70 @@
+import itertools
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipeapi.pantry_index import PantryIndex
+
+
+class Command(BaseCommand):
+    help = "Time PantryIndex.rank against a synthetic in-memory catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=100_000)
+        parser.add_argument("--ingredients", type=int, default=5_000)
+        parser.add_argument("--per-recipe", type=int, default=10)
+        parser.add_argument("--pantry", type=int, default=15)
+        parser.add_argument("--queries", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        ingredients = range(1, options["ingredients"] + 1)
+        # Zipf-like popularity: a few staples appear in most recipes
+        weights = [1 / rank for rank in ingredients]
+
+        def sample(count):
+            return set(rng.choices(ingredients, weights=weights, k=count))
+
+        pairs = [
+            (recipe_id, ingredient_id)
+            for recipe_id in range(1, options["recipes"] + 1)
+            for ingredient_id in sample(options["per_recipe"])
+        ]
+        index = PantryIndex()
+        started = time.perf_counter()
+        index.rebuild(pairs)
+        self.stdout.write(
+            f"Indexed {len(pairs)} recipe ingredients in "
+            f"{time.perf_counter() - started:.2f}s"
+        )
+
+        pantries = [sample(options["pantry"]) for _ in range(options["queries"])]
+        self.report("steady", self.time_queries(index, pantries))
+
+        # ranking keeps using the old tables while a rebuild runs
+        rebuild = threading.Thread(target=index.rebuild, args=(pairs,))
+        rebuild.start()
+        timings, replay = [], itertools.cycle(pantries)
+        while True:  # at least one batch, however quick the rebuild
+            timings.extend(self.time_queries(index, itertools.islice(replay, 10)))
+            if not rebuild.is_alive():
+                break
+        rebuild.join()
+        self.report("rebuild", timings)
+
+    def time_queries(self, index, pantries):
+        timings = []
+        for pantry in pantries:
+            started = time.perf_counter()
+            index.rank(pantry)
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    def report(self, phase, timings):
+        timings.sort()
+        for label, fraction in [("p50", 0.5), ("p95", 0.95), ("p99", 0.99)]:
+            value = timings[min(len(timings) - 1, int(len(timings) * fraction))]
+            self.stdout.write(f"{phase} {label}: {value * 1e3:.2f} ms")
@@ -0,0 +1,147 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from recipeapi.models import (
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipePicture,
+)
+from recipeapi.renderers import ORJSONRenderer, orjson
+from recipeapi.sparse_fields import requested_fields
+from recipeapi.views.recipe_view import RecipeSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Time loading, serializing and rendering a list of recipes, full and "
+        "with a sparse fieldset, with the stdlib and orjson renderers. The "
+        "catalog is created in a transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=1000)
+        parser.add_argument("--ingredients", type=int, default=8, help="Per recipe")
+        parser.add_argument("--favorites", type=int, default=5, help="Per recipe")
+        parser.add_argument(
+            "--fields", default="id,description,primary_picture", help="Sparse fieldset"
+        )
+        parser.add_argument("--repeat", type=int, default=5, help="Best of N runs")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--host", default="localhost", help="Host the payload URLs are built for"
+        )
+
+    def handle(self, *args, **options):
+        renderers = [("stdlib", JSONRenderer())]
+        if orjson is not None:
+            renderers.append(("orjson", ORJSONRenderer()))
+        else:
+            self.stderr.write("orjson is not installed; timing the stdlib only")
+
+        self.stdout.write(
+            f"{'payload':<10}{'renderer':<10}{'queries':>8}{'load':>10}"
+            f"{'serialize':>11}{'render':>10}{'bytes':>12}"
+        )
+        with transaction.atomic():
+            user = self.seed(options)
+            for payload, params in [
+                ("full", {}),
+                ("sparse", {"fields": options["fields"]}),
+            ]:
+                for name, renderer in renderers:
+                    result = min(
+                        (
+                            self.measure(user, params, renderer, options["host"])
+                            for _ in range(options["repeat"])
+                        ),
+                        key=lambda r: r["load"] + r["serialize"] + r["render"],
+                    )
+                    self.stdout.write(
+                        f"{payload:<10}{name:<10}{result['queries']:>8}"
+                        f"{result['load'] * 1e3:>8.1f}ms"
+                        f"{result['serialize'] * 1e3:>9.1f}ms"
+                        f"{result['render'] * 1e3:>8.1f}ms{result['bytes']:>12,}"
+                    )
+            transaction.set_rollback(True)
+
+    def seed(self, options):
+        rng = random.Random(options["seed"])
+        users = User.objects.bulk_create(
+            [User(username=f"render-bench-{i}") for i in range(options["favorites"])]
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=f"bench ingredient {i}", normalized_name=f"bench {i}")
+                for i in range(200)
+            ]
+        )
+        recipes = Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    user=users[0],
+                    description=f"Benchmark recipe {i}",
+                    summary="Simmer everything until tender. " * 4,
+                    favorites_count=options["favorites"],
+                )
+                for i in range(options["recipes"])
+            ]
+        )
+        RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(recipe=recipe, ingredient=ingredient)
+                for recipe in recipes
+                for ingredient in rng.sample(ingredients, options["ingredients"])
+            ]
+        )
+        RecipePicture.objects.bulk_create(
+            [
+                RecipePicture(
+                    recipe=recipe,
+                    image=f"recipe_images/bench-{recipe.id}-{n}.jpg",
+                    is_primary=n == 0,
+                    status=RecipePicture.READY,
+                )
+                for recipe in recipes
+                for n in range(2)
+            ]
+        )
+        FavoriteRecipe.objects.bulk_create(
+            [
+                FavoriteRecipe(user=user, recipe=recipe)
+                for recipe in recipes
+                for user in users
+            ]
+        )
+        return users[0]
+
+    def measure(self, user, params, renderer, host):
+        factory = APIRequestFactory(SERVER_NAME=host)
+        request = Request(factory.get("/recipes", params))
+        request.user = user
+        queryset = Recipe.objects.filter(user=user)
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.process_time()
+            recipes = list(queryset.with_details(user, requested_fields(request)))
+            loaded = time.process_time()
+        data = RecipeSerializer(recipes, many=True, context={"request": request}).data
+        serialized = time.process_time()
+        body = renderer.render(data, "application/json")
+        rendered = time.process_time()
+        return {
+            "queries": len(queries.captured_queries),
+            "load": loaded - started,
+            "serialize": serialized - loaded,
+            "render": rendered - serialized,
+            "bytes": len(body),
+        }
@@ -0,0 +1,164 @@
+import os
+import random
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+
+from recipeapi.models import FavoriteRecipe, Ingredient, Recipe, RecipeIngredient
+
+# what settings.py looked like before the tuned profile: rollback journal,
+# default pragmas and a new connection for every request
+PROFILES = {
+    "plain": {"ENGINE": "django.db.backends.sqlite3"},
+    "tuned": {
+        key: value
+        for key, value in settings.DATABASES["default"].items()
+        if key != "NAME"
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare mixed read/write throughput of the tuned SQLite settings "
+        "against plain SQLite, each on a scratch database file"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--seconds", type=float, default=10.0)
+        parser.add_argument("--recipes", type=int, default=2000)
+        parser.add_argument(
+            "--write-ratio", type=float, default=0.2, help="Share of writes"
+        )
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'profile':<8}{'ops/s':>9}{'reads/s':>9}{'writes/s':>9}"
+            f"{'read p95':>10}{'write p95':>10}{'locked':>8}"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for name, profile in PROFILES.items():
+                alias = f"benchmark_{name}"
+                self.add_database(alias, profile, os.path.join(directory, name))
+                try:
+                    self.seed(alias, options)
+                    self.report(name, self.run(alias, options))
+                finally:
+                    connections[alias].close()
+
+    def add_database(self, alias, profile, path):
+        configured = connections.configure_settings(
+            {"default": settings.DATABASES["default"], alias: {**profile, "NAME": path}}
+        )
+        connections.settings[alias] = configured[alias]
+        call_command("migrate", database=alias, verbosity=0)
+
+    def seed(self, alias, options):
+        rng = random.Random(options["seed"])
+        users = User.objects.using(alias).bulk_create(
+            [User(username=f"bench-{i}") for i in range(50)]
+        )
+        ingredients = Ingredient.objects.using(alias).bulk_create(
+            [
+                Ingredient(name=f"ingredient {i}", normalized_name=f"ingredient {i}")
+                for i in range(300)
+            ]
+        )
+        recipes = Recipe.objects.using(alias).bulk_create(
+            [
+                Recipe(user=rng.choice(users), description=f"Recipe {i}")
+                for i in range(options["recipes"])
+            ]
+        )
+        RecipeIngredient.objects.using(alias).bulk_create(
+            [
+                RecipeIngredient(recipe=recipe, ingredient=ingredient)
+                for recipe in recipes
+                for ingredient in rng.sample(ingredients, 6)
+            ]
+        )
+        connections[alias].close()
+
+    def run(self, alias, options):
+        recipe_ids = list(Recipe.objects.using(alias).values_list("id", flat=True))
+        user_ids = list(User.objects.using(alias).values_list("id", flat=True))
+        connections[alias].close()
+        deadline = time.perf_counter() + options["seconds"]
+        reads, writes, locked = [], [], []
+        lock = threading.Lock()
+
+        def read(rng):
+            # the queries behind GET /recipes/<id>
+            Recipe.objects.using(alias).with_details(None).get(
+                pk=rng.choice(recipe_ids)
+            )
+
+        def write(rng):
+            # the work behind POST /recipes/<id>/favorite, minus the signals
+            recipe_id = rng.choice(recipe_ids)
+            with transaction.atomic(using=alias):
+                FavoriteRecipe.objects.using(alias).bulk_create(
+                    [FavoriteRecipe(user_id=rng.choice(user_ids), recipe_id=recipe_id)],
+                    ignore_conflicts=True,
+                )
+                Recipe.objects.using(alias).filter(pk=recipe_id).update(
+                    favorites_count=F("favorites_count") + 1
+                )
+
+        def worker(seed):
+            rng = random.Random(seed)
+            timings = {"read": [], "write": []}
+            errors = 0
+            while time.perf_counter() < deadline:
+                kind = "write" if rng.random() < options["write_ratio"] else "read"
+                started = time.perf_counter()
+                try:
+                    (write if kind == "write" else read)(rng)
+                    timings[kind].append(time.perf_counter() - started)
+                except OperationalError:
+                    errors += 1
+                # what request_finished does at the end of every request
+                connections[alias].close_if_unusable_or_obsolete()
+            connections[alias].close()
+            with lock:
+                reads.extend(timings["read"])
+                writes.extend(timings["write"])
+                locked.append(errors)
+
+        threads = [
+            threading.Thread(target=worker, args=(options["seed"] + i,))
+            for i in range(options["threads"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {
+            "seconds": options["seconds"],
+            "reads": sorted(reads),
+            "writes": sorted(writes),
+            "locked": sum(locked),
+        }
+
+    def report(self, name, result):
+        def p95(timings):
+            if not timings:
+                return "-"
+            return f"{timings[int(len(timings) * 0.95)] * 1e3:.1f}ms"
+
+        seconds = result["seconds"]
+        reads, writes = len(result["reads"]), len(result["writes"])
+        self.stdout.write(
+            f"{name:<8}{(reads + writes) / seconds:>9.0f}{reads / seconds:>9.0f}"
+            f"{writes / seconds:>9.0f}{p95(result['reads']):>10}"
+            f"{p95(result['writes']):>10}{result['locked']:>8}"
+        )
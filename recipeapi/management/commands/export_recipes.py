@@ -0,0 +1,27 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from recipeapi.recipe_ndjson import export_recipes
+
+
+class Command(BaseCommand):
+    help = "Stream the recipe catalog out as NDJSON, one recipe per line"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", nargs="?", default="-", help="Output file, or - for stdout"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        # progress goes to stderr so stdout can be piped straight into a file
+        def progress(done):
+            self.stderr.write(f"Exported {done} recipes")
+
+        if options["path"] == "-":
+            done = export_recipes(sys.stdout, options["batch_size"], progress)
+        else:
+            with open(options["path"], "w", encoding="utf-8") as out:
+                done = export_recipes(out, options["batch_size"], progress)
+        self.stderr.write(f"Exported {done} recipes in total")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from recipeapi.synthetic import generate_catalog
+
+
+class Command(BaseCommand):
+    help = "Fill the database with a reproducible synthetic recipe catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--recipes", type=int, default=10_000)
+        parser.add_argument("--ingredients", type=int, default=2_000)
+        parser.add_argument("--favorites", type=int, default=20_000)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        counts = generate_catalog(
+            users=options["users"],
+            recipes=options["recipes"],
+            ingredients=options["ingredients"],
+            favorites=options["favorites"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            progress=lambda message: self.stdout.write(f"Created {message}"),
+        )
+        self.stdout.write(
+            ", ".join(f"{count} {table}" for table, count in counts.items())
+        )
@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipeapi.recipe_ndjson import NDJSONError, import_recipes
+
+
+class Command(BaseCommand):
+    help = "Create recipes from an NDJSON file written by export_recipes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Input file, or - for stdin")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--user", help="Assign every recipe to this user instead of its owner"
+        )
+        parser.add_argument(
+            "--create-users",
+            action="store_true",
+            help="Create missing users (without a usable password)",
+        )
+
+    def handle(self, *args, **options):
+        def progress(done):
+            self.stdout.write(f"Imported {done} recipes")
+
+        def run(lines):
+            return import_recipes(
+                lines,
+                options["batch_size"],
+                username=options["user"],
+                create_users=options["create_users"],
+                progress=progress,
+            )
+
+        try:
+            if options["path"] == "-":
+                done = run(sys.stdin)
+            else:
+                with open(options["path"], encoding="utf-8") as lines:
+                    done = run(lines)
+        except NDJSONError as e:
+            # batches before the failing one are already committed
+            raise CommandError(str(e)) from e
+        self.stdout.write(f"Imported {done} recipes in total")
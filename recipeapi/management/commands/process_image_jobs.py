@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipeapi.image_jobs import run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Download queued recipe images into their pending RecipePicture rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true", help="Drain the due jobs and exit"
+        )
+        parser.add_argument("--batch-size", type=int, default=20)
+        parser.add_argument(
+            "--sleep", type=float, default=1.0, help="Seconds to wait when idle"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            handled = run_pending_jobs(options["batch_size"])
+            if handled:
+                self.stdout.write(f"Processed {handled} image job(s)")
+            elif options["once"]:
+                return
+            else:
+                time.sleep(options["sleep"])
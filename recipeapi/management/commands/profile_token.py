@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from recipeapi.profiling import PROFILERS, make_token
+
+
+class Command(BaseCommand):
+    help = "Print an X-Profile header value that profiles the requests sending it"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiler", choices=sorted(PROFILERS), default="cprofile")
+
+    def handle(self, *args, **options):
+        self.stdout.write(make_token(options["profiler"]))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from recipeapi.models import Recipe
+from recipeapi.similarity import refresh_signatures
+
+
+class Command(BaseCommand):
+    help = "Recompute the MinHash signatures behind /recipes/<id>/similar"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        recipe_ids = Recipe.objects.order_by("id").values_list("id", flat=True)
+        batch, done = [], 0
+        for recipe_id in recipe_ids.iterator():
+            batch.append(recipe_id)
+            if len(batch) == options["batch_size"]:
+                refresh_signatures(batch)
+                done += len(batch)
+                batch = []
+                self.stdout.write(f"Processed {done} recipes")
+        if batch:
+            refresh_signatures(batch)
+            done += len(batch)
+        self.stdout.write(f"Rebuilt signatures for {done} recipes")
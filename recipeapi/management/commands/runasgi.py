@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the API over ASGI with uvicorn, so one worker process handles "
+        "many concurrent requests and the async views hold no thread per request"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8000)
+        parser.add_argument(
+            "--workers", type=int, default=1, help="Worker processes to run"
+        )
+        parser.add_argument("--reload", action="store_true")
+
+    def handle(self, *args, **options):
+        try:
+            import uvicorn
+        except ImportError:
+            raise CommandError("runasgi needs uvicorn: pip install uvicorn")
+
+        uvicorn.run(
+            "recipeproject.asgi:application",
+            host=options["host"],
+            port=options["port"],
+            workers=options["workers"],
+            reload=options["reload"],
+            lifespan="off",  # Django's ASGI handler has no lifespan support
+        )
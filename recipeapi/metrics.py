@@ -0,0 +1,262 @@
+import bisect
+import contextvars
+import logging
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Prometheus-style bucket upper bounds: seconds, and queries per request
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """What one request spent its time on, in seconds"""
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.phases = {}  # name -> seconds, e.g. "serialize"
+        self._open = set()
+
+    def server_timing(self, total):
+        parts = [f"app;dur={total * 1e3:.1f}"]
+        parts.append(
+            f'db;dur={self.db_time * 1e3:.1f};desc="{self.db_queries} queries"'
+        )
+        parts += [f"{name};dur={s * 1e3:.1f}" for name, s in self.phases.items()]
+        return ", ".join(parts)
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's `name` phase.
+
+    Nested blocks with the same name (a serializer inside a serializer) are
+    only counted once. Outside a request this does nothing.
+    """
+    timings = _current.get()
+    if timings is None or name in timings._open:
+        yield
+        return
+    timings._open.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._open.discard(name)
+        timings.phases[name] = (
+            timings.phases.get(name, 0.0) + time.perf_counter() - started
+        )
+
+
+class TimedSerializerMixin:
+    """Count a serializer's to_representation as the request's serialize time"""
+
+    def to_representation(self, instance):
+        with timed("serialize"):
+            return super().to_representation(instance)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """Per-route request histograms for this process.
+
+    Each worker process keeps its own numbers; Prometheus sums them when it
+    scrapes every worker, which is how its client libraries work too.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.durations = {}
+            self.db_durations = {}
+            self.queries = {}
+            self.serialize = {}
+            self.responses = {}
+
+    def record(self, view, method, status, duration, timings):
+        key = (view, method)
+        with self._lock:
+            if key not in self.durations:
+                self.durations[key] = Histogram(DURATION_BUCKETS)
+                self.db_durations[key] = Histogram(DURATION_BUCKETS)
+                self.queries[key] = Histogram(QUERY_BUCKETS)
+                self.serialize[key] = 0.0
+            self.durations[key].observe(duration)
+            self.db_durations[key].observe(timings.db_time)
+            self.queries[key].observe(timings.db_queries)
+            self.serialize[key] += timings.phases.get("serialize", 0.0)
+            status_key = (view, method, str(status))
+            self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+    def render(self):
+        """The registry in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, help_text, histograms in [
+                (
+                    "recipeapi_request_duration_seconds",
+                    "Wall time of each request",
+                    self.durations,
+                ),
+                (
+                    "recipeapi_request_db_duration_seconds",
+                    "Time each request spent running SQL",
+                    self.db_durations,
+                ),
+                (
+                    "recipeapi_request_db_queries",
+                    "SQL queries issued by each request",
+                    self.queries,
+                ),
+            ]:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (view, method), histogram in sorted(histograms.items()):
+                    labels = f'view="{view}",method="{method}"'
+                    cumulative = 0
+                    bounds = [str(b) for b in histogram.buckets] + ["+Inf"]
+                    for bound, count in zip(bounds, histogram.counts):
+                        cumulative += count
+                        lines.append(
+                            f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                        )
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{labels}}} {cumulative}")
+
+            name = "recipeapi_request_serialize_seconds_total"
+            lines += [
+                f"# HELP {name} Time spent serializing response data",
+                f"# TYPE {name} counter",
+            ]
+            for (view, method), total in sorted(self.serialize.items()):
+                lines.append(f'{name}{{view="{view}",method="{method}"}} {total}')
+
+            name = "recipeapi_responses_total"
+            lines += [f"# HELP {name} Responses by status", f"# TYPE {name} counter"]
+            for (view, method, status), count in sorted(self.responses.items()):
+                lines.append(
+                    f'{name}{{view="{view}",method="{method}",status="{status}"}} '
+                    f"{count}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def record_query(execute, sql, params, many, context):
+    """connection.execute_wrapper hook: time each query for the current request"""
+    timings = _current.get()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        if timings is not None:
+            timings.db_queries += 1
+            timings.db_time += elapsed
+        threshold = getattr(settings, "METRICS_SLOW_QUERY_MS", 100) / 1000
+        if getattr(settings, "METRICS_LOG_SLOW_QUERIES", False) and (
+            elapsed >= threshold
+        ):
+            logger.warning(
+                "Slow query (%.1f ms) on %s: %s %r\n%s",
+                elapsed * 1e3,
+                context["connection"].alias,
+                sql,
+                params,
+                "".join(traceback.format_stack()[:-1]),
+            )
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created receiver: time every query run on `connection`.
+
+    Installed once per connection rather than per request, because the
+    async ORM runs queries on a worker thread with its own connections.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def view_label(request):
+    match = getattr(request, "resolver_match", None)
+    return (match.view_name or match.route) if match else "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """Time every request and publish the numbers.
+
+    Adds a Server-Timing header (total, SQL time and query count, and any
+    phases recorded with `timed`, such as serialize) and feeds the per-view
+    histograms served at /metrics. With METRICS_LOG_SLOW_QUERIES on, any
+    query slower than METRICS_SLOW_QUERY_MS is logged with its stack. Works
+    in both sync and async stacks, so it never forces an async view onto a
+    thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, "METRICS_ENABLED", True):
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.publish(request, response, timings, started)
+
+    async def __acall__(self, request):
+        if not getattr(settings, "METRICS_ENABLED", True):
+            return await self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.publish(request, response, timings, started)
+
+    def publish(self, request, response, timings, started):
+        duration = time.perf_counter() - started
+        response["Server-Timing"] = timings.server_timing(duration)
+        registry.record(
+            view_label(request), request.method, response.status_code, duration, timings
+        )
+        return response
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:16
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipeapi', '0004_alter_recipe_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipepicture',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='recipepicture',
+            name='image',
+            field=models.ImageField(blank=True, upload_to='recipe_images/'),
+        ),
+        migrations.CreateModel(
+            name='ImageIngestJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=2000)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('picture', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingest_jobs', to='recipeapi.recipepicture')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='recipeapi_i_status_2cf2a2_idx')],
+            },
+        ),
+    ]
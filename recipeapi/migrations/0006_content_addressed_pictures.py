@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:19
+
+import recipeapi.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipeapi', '0005_image_ingest_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipepicture',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, storage=recipeapi.storage.get_picture_storage, upload_to='recipe_images/'),
+        ),
+    ]
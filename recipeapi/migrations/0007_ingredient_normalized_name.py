@@ -0,0 +1,47 @@
+from django.db import migrations, models
+
+
+def populate_normalized_names(apps, schema_editor):
+    """Fill normalized_name and merge ingredients that collide on it.
+
+    Recipes pointing at a duplicate are repointed at the lowest-id ingredient
+    with the same normalized name before the duplicate is removed.
+    """
+    Ingredient = apps.get_model("recipeapi", "Ingredient")
+    RecipeIngredient = apps.get_model("recipeapi", "RecipeIngredient")
+
+    survivors = {}
+    for ingredient in Ingredient.objects.order_by("id"):
+        name = " ".join(ingredient.name.split())
+        key = name.casefold()
+        if key in survivors:
+            RecipeIngredient.objects.filter(ingredient=ingredient).update(
+                ingredient=survivors[key]
+            )
+            ingredient.delete()
+            continue
+        survivors[key] = ingredient
+        ingredient.name = name
+        ingredient.normalized_name = key
+        ingredient.save(update_fields=["name", "normalized_name"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipeapi', '0006_content_addressed_pictures'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='normalized_name',
+            field=models.CharField(editable=False, max_length=255, null=True),
+        ),
+        migrations.RunPython(populate_normalized_names, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='normalized_name',
+            field=models.CharField(editable=False, max_length=255, unique=True),
+        ),
+    ]
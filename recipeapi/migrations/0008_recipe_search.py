@@ -0,0 +1,62 @@
+from django.db import migrations
+
+# External-content FTS5 index over Recipe.description and Recipe.summary. The
+# triggers keep it in step with every write, including bulk inserts and raw SQL.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE recipeapi_recipe_fts USING fts5(
+        description, summary,
+        content='recipeapi_recipe', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER recipeapi_recipe_fts_ai AFTER INSERT ON recipeapi_recipe BEGIN
+        INSERT INTO recipeapi_recipe_fts(rowid, description, summary)
+        VALUES (new.id, new.description, new.summary);
+    END
+    """,
+    """
+    CREATE TRIGGER recipeapi_recipe_fts_ad AFTER DELETE ON recipeapi_recipe BEGIN
+        INSERT INTO recipeapi_recipe_fts(recipeapi_recipe_fts, rowid, description, summary)
+        VALUES ('delete', old.id, old.description, old.summary);
+    END
+    """,
+    """
+    CREATE TRIGGER recipeapi_recipe_fts_au AFTER UPDATE OF description, summary ON recipeapi_recipe BEGIN
+        INSERT INTO recipeapi_recipe_fts(recipeapi_recipe_fts, rowid, description, summary)
+        VALUES ('delete', old.id, old.description, old.summary);
+        INSERT INTO recipeapi_recipe_fts(rowid, description, summary)
+        VALUES (new.id, new.description, new.summary);
+    END
+    """,
+    "INSERT INTO recipeapi_recipe_fts(recipeapi_recipe_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS recipeapi_recipe_fts_au",
+    "DROP TRIGGER IF EXISTS recipeapi_recipe_fts_ad",
+    "DROP TRIGGER IF EXISTS recipeapi_recipe_fts_ai",
+    "DROP TABLE IF EXISTS recipeapi_recipe_fts",
+]
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipeapi', '0007_ingredient_normalized_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(CREATE_SQL), run_on_sqlite(DROP_SQL)),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipeapi", "0008_recipe_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeSignature",
+            fields=[
+                (
+                    "recipe",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="signature",
+                        serialize=False,
+                        to="recipeapi.recipe",
+                    ),
+                ),
+                ("minhash", models.BinaryField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="RecipeBand",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("band", models.PositiveSmallIntegerField()),
+                ("bucket", models.BigIntegerField()),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="bands",
+                        to="recipeapi.recipe",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["band", "bucket"], name="recipeapi_r_band_833cfe_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:35
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+# Adding favorites_count makes SQLite rebuild recipeapi_recipe, which drops
+# the search triggers from migration 0008; recreate them as they were there.
+TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS recipeapi_recipe_fts_ai AFTER INSERT ON recipeapi_recipe BEGIN
+        INSERT INTO recipeapi_recipe_fts(rowid, description, summary)
+        VALUES (new.id, new.description, new.summary);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipeapi_recipe_fts_ad AFTER DELETE ON recipeapi_recipe BEGIN
+        INSERT INTO recipeapi_recipe_fts(recipeapi_recipe_fts, rowid, description, summary)
+        VALUES ('delete', old.id, old.description, old.summary);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipeapi_recipe_fts_au AFTER UPDATE OF description, summary ON recipeapi_recipe BEGIN
+        INSERT INTO recipeapi_recipe_fts(recipeapi_recipe_fts, rowid, description, summary)
+        VALUES ('delete', old.id, old.description, old.summary);
+        INSERT INTO recipeapi_recipe_fts(rowid, description, summary)
+        VALUES (new.id, new.description, new.summary);
+    END
+    """,
+]
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+def dedupe_and_count_favorites(apps, schema_editor):
+    """Drop duplicate (user, recipe) favorites, then fill favorites_count"""
+    FavoriteRecipe = apps.get_model("recipeapi", "FavoriteRecipe")
+    Recipe = apps.get_model("recipeapi", "Recipe")
+
+    duplicates = (
+        FavoriteRecipe.objects.values("user", "recipe")
+        .annotate(keep=Min("id"), total=Count("id"))
+        .filter(total__gt=1)
+    )
+    for row in duplicates:
+        FavoriteRecipe.objects.filter(user=row["user"], recipe=row["recipe"]).exclude(
+            id=row["keep"]
+        ).delete()
+
+    counts = FavoriteRecipe.objects.values("recipe").annotate(total=Count("id"))
+    for row in counts:
+        Recipe.objects.filter(pk=row["recipe"]).update(favorites_count=row["total"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipeapi", "0009_recipe_similarity"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="favorites_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(run_on_sqlite(TRIGGERS_SQL), migrations.RunPython.noop),
+        migrations.RunPython(dedupe_and_count_favorites, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="favoriterecipe",
+            constraint=models.UniqueConstraint(
+                fields=("user", "recipe"), name="unique_favorite_per_user"
+            ),
+        ),
+    ]
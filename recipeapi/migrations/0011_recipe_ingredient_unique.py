@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:20
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def dedupe_recipe_ingredients(apps, schema_editor):
+    """Drop duplicate (recipe, ingredient) links, keeping the oldest"""
+    RecipeIngredient = apps.get_model("recipeapi", "RecipeIngredient")
+
+    duplicates = (
+        RecipeIngredient.objects.values("recipe", "ingredient")
+        .annotate(keep=Min("id"), total=Count("id"))
+        .filter(total__gt=1)
+    )
+    for row in duplicates:
+        RecipeIngredient.objects.filter(
+            recipe=row["recipe"], ingredient=row["ingredient"]
+        ).exclude(id=row["keep"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipeapi", "0010_favorites_count"),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_recipe_ingredients, migrations.RunPython.noop),
+        # rebuilds recipeapi_recipeingredient on SQLite; recipeapi_recipe and
+        # its search triggers are untouched
+        migrations.AddConstraint(
+            model_name="recipeingredient",
+            constraint=models.UniqueConstraint(
+                fields=("recipe", "ingredient"), name="unique_ingredient_per_recipe"
+            ),
+        ),
+    ]
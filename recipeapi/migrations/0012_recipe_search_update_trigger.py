@@ -0,0 +1,50 @@
+from django.db import migrations
+
+# Narrow the search update trigger to the indexed columns, so writes such as
+# favorites_count changes no longer delete and reinsert the recipe's FTS row.
+# Databases migrated before 0008 and 0010 declared it this way still have the
+# trigger that fires on every UPDATE.
+NARROW_SQL = [
+    "DROP TRIGGER IF EXISTS recipeapi_recipe_fts_au",
+    """
+    CREATE TRIGGER recipeapi_recipe_fts_au AFTER UPDATE OF description, summary ON recipeapi_recipe BEGIN
+        INSERT INTO recipeapi_recipe_fts(recipeapi_recipe_fts, rowid, description, summary)
+        VALUES ('delete', old.id, old.description, old.summary);
+        INSERT INTO recipeapi_recipe_fts(rowid, description, summary)
+        VALUES (new.id, new.description, new.summary);
+    END
+    """,
+]
+
+WIDEN_SQL = [
+    "DROP TRIGGER IF EXISTS recipeapi_recipe_fts_au",
+    """
+    CREATE TRIGGER recipeapi_recipe_fts_au AFTER UPDATE ON recipeapi_recipe BEGIN
+        INSERT INTO recipeapi_recipe_fts(recipeapi_recipe_fts, rowid, description, summary)
+        VALUES ('delete', old.id, old.description, old.summary);
+        INSERT INTO recipeapi_recipe_fts(rowid, description, summary)
+        VALUES (new.id, new.description, new.summary);
+    END
+    """,
+]
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipeapi", "0011_recipe_ingredient_unique"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(NARROW_SQL), run_on_sqlite(WIDEN_SQL)),
+    ]
@@ -3,3 +3,6 @@ from .ingredient import Ingredient
 from .recipe_ingredient import RecipeIngredient
 from .recipe_picture import RecipePicture
 from .favorite_recipe import FavoriteRecipe
+from .image_ingest_job import ImageIngestJob
+from .recipe_signature import RecipeSignature
+from .recipe_band import RecipeBand
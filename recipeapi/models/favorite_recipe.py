@@ -9,5 +9,12 @@ class FavoriteRecipe(models.Model):
         Recipe, on_delete=models.CASCADE, related_name="favorites"
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"], name="unique_favorite_per_user"
+            )
+        ]
+
     def __str__(self):
         return f"Favorite: {self.user.username} -> {self.recipe.summary}"
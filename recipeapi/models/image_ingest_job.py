@@ -0,0 +1,35 @@
+from django.db import models
+from django.utils import timezone
+from .recipe_picture import RecipePicture
+
+
+class ImageIngestJob(models.Model):
+    """A remote image waiting to be downloaded into a pending RecipePicture"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    picture = models.ForeignKey(
+        RecipePicture, on_delete=models.CASCADE, related_name="ingest_jobs"
+    )
+    url = models.URLField(max_length=2000)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_after"])]
+
+    def __str__(self):
+        return f"Ingest {self.url} -> Picture {self.picture_id} ({self.status})"
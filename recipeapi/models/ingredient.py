@@ -1,8 +1,59 @@
 from django.db import models
 
 
+def clean_name(name):
+    """Trim an ingredient name and collapse runs of whitespace"""
+    return " ".join(name.split())
+
+
+def normalize_name(name):
+    """Lookup key for an ingredient name: cleaned and case-folded"""
+    return clean_name(name).casefold()
+
+
+class IngredientQuerySet(models.QuerySet):
+    def resolve_names(self, names):
+        """Return one ingredient per distinct name, creating any that are missing.
+
+        Costs one IN query, plus one bulk insert and one re-read when some
+        names are new. Conflicting concurrent inserts are ignored and picked
+        up by the re-read. bulk_create sends no post_save, so the new
+        ingredients are added to the search index here.
+        """
+        from recipeapi.ingredient_index import ingredient_index  # imports this module
+
+        wanted = {}
+        for name in names:
+            name = clean_name(name)
+            if name:
+                wanted.setdefault(normalize_name(name), name)
+
+        found = {
+            ingredient.normalized_name: ingredient
+            for ingredient in self.filter(normalized_name__in=wanted)
+        }
+        missing = [key for key in wanted if key not in found]
+        if missing:
+            self.bulk_create(
+                [Ingredient(name=wanted[key], normalized_name=key) for key in missing],
+                ignore_conflicts=True,
+            )
+            for ingredient in self.filter(normalized_name__in=missing):
+                found[ingredient.normalized_name] = ingredient
+                ingredient_index.add(ingredient.pk, ingredient.name)
+        return [found[key] for key in wanted]
+
+
 class Ingredient(models.Model):
     name = models.CharField(max_length=255)
+    normalized_name = models.CharField(max_length=255, unique=True, editable=False)
+
+    objects = IngredientQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        self.name = clean_name(self.name)
+        self.normalized_name = normalize_name(self.name)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
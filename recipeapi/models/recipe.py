@@ -1,7 +1,67 @@
 from django.db import models
+from django.db.models import (
+    Count,
+    Exists,
+    ExpressionWrapper,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from .ingredient import Ingredient
 
+# the relation each RecipeSerializer field reads
+DETAIL_PREFETCHES = {
+    "ingredients": "ingredients",
+    "pictures": "pictures",
+    "primary_picture": "pictures",
+    "favorites": "favorites",
+}
+
+
+class RecipeQuerySet(models.QuerySet):
+    def with_details(self, user=None, fields=None):
+        """Load everything RecipeSerializer touches in a fixed number of queries.
+
+        `fields`, a sparse fieldset, skips the prefetches of relations that
+        will not be rendered.
+        """
+        from .favorite_recipe import FavoriteRecipe  # avoid circular import
+
+        prefetches = dict.fromkeys(
+            relation
+            for field, relation in DETAIL_PREFETCHES.items()
+            if fields is None or field in fields
+        )
+        queryset = self.prefetch_related(*prefetches)
+        if user is None or user.is_anonymous:
+            return queryset.annotate(
+                is_owner=Value(False, output_field=models.BooleanField()),
+                is_favorite=Value(False, output_field=models.BooleanField()),
+            )
+        return queryset.annotate(
+            is_owner=ExpressionWrapper(
+                Q(user_id=user.id), output_field=models.BooleanField()
+            ),
+            is_favorite=Exists(
+                FavoriteRecipe.objects.filter(recipe=OuterRef("pk"), user_id=user.id)
+            ),
+        )
+
+    def recount_favorites(self):
+        """Recompute favorites_count for these recipes in a single UPDATE"""
+        from .favorite_recipe import FavoriteRecipe  # avoid circular import
+
+        counts = (
+            FavoriteRecipe.objects.filter(recipe=OuterRef("pk"))
+            .values("recipe")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        return self.update(favorites_count=Coalesce(Subquery(counts), 0))
+
 
 class Recipe(models.Model):
     description = models.CharField(max_length=255)
@@ -10,6 +70,10 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField(
         Ingredient, through="RecipeIngredient", related_name="recipes"
     )
+    # denormalized count of FavoriteRecipe rows, kept in step by recipeapi.signals
+    favorites_count = models.PositiveIntegerField(default=0)
+
+    objects = RecipeQuerySet.as_manager()
 
     def __str__(self):
         return self.description
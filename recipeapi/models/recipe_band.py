@@ -0,0 +1,16 @@
+from django.db import models
+from .recipe import Recipe
+
+
+class RecipeBand(models.Model):
+    """One LSH band of a recipe's MinHash signature, hashed into a bucket"""
+
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="bands")
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=["band", "bucket"])]
+
+    def __str__(self):
+        return f"Recipe {self.recipe_id} band {self.band} -> {self.bucket}"
@@ -11,5 +11,12 @@ class RecipeIngredient(models.Model):
         Ingredient, on_delete=models.CASCADE, related_name="recipe_ingredients"
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "ingredient"], name="unique_ingredient_per_recipe"
+            )
+        ]
+
     def __str__(self):
         return f"{self.recipe.description} - {self.ingredient.name}"
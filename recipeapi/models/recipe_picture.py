@@ -1,14 +1,48 @@
-from django.db import models
+from django.db import models, transaction
+from recipeapi.image_variants import delete_variants
+from recipeapi.storage import get_picture_storage
 
 
 class RecipePicture(models.Model):
+    PENDING = "pending"
+    READY = "ready"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (READY, "Ready"), (FAILED, "Failed")]
+
     recipe = models.ForeignKey(
         "Recipe",  # Using string reference to avoid circular imports
         on_delete=models.CASCADE,
         related_name="pictures",
     )
-    image = models.ImageField(upload_to="recipe_images/")
+    # content-addressed, so several pictures may share one file on disk
+    image = models.ImageField(
+        upload_to="recipe_images/",
+        storage=get_picture_storage,
+        blank=True,
+        db_index=True,
+    )
     is_primary = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=READY)
+
+    def save(self, *args, **kwargs):
+        # content being saved now may be deduplicated against a blob that a
+        # concurrent release deletes before this row commits; write it back
+        content = None if self.image.closed else self.image.file
+        super().save(*args, **kwargs)
+        storage = self.image.storage
+        if content is not None and storage.is_content_addressed(self.image.name):
+            name = self.image.name
+            transaction.on_commit(lambda: storage.restore(name, content))
+
+    @classmethod
+    def release_image(cls, name):
+        """Delete the content-addressed file `name` once no picture references it"""
+        storage = get_picture_storage()
+        if not name or not storage.is_content_addressed(name):
+            return  # legacy and fixture files are left alone
+        referenced = cls.objects.filter(image=name).exists
+        if storage.delete_unreferenced(name, referenced):
+            delete_variants(name)
 
     def __str__(self):
         return f"Image {self.id} for Recipe {self.recipe.description}"
@@ -0,0 +1,14 @@
+from django.db import models
+from .recipe import Recipe
+
+
+class RecipeSignature(models.Model):
+    """MinHash signature of a recipe's ingredient set, packed as uint64s"""
+
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True, related_name="signature"
+    )
+    minhash = models.BinaryField()
+
+    def __str__(self):
+        return f"Signature for Recipe {self.recipe_id}"
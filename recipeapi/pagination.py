@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """Opaque-cursor keyset pagination on the primary key.
+
+    Each page is a `WHERE id > cursor ORDER BY id LIMIT n` lookup, so fetching
+    page 1000 costs the same as fetching page 1.
+    """
+
+    ordering = "id"
+    page_size_query_param = "page_size"
+    max_page_size = 200
@@ -0,0 +1,159 @@
+from recipeapi.models.recipe_ingredient import RecipeIngredient
+from recipeapi.rebuilding_index import RebuildingIndex
+
+
+class PantryIndex(RebuildingIndex):
+    """In-process inverted index from ingredient to the recipes using it.
+
+    Every recipe gets a bit position and every ingredient a bitset (a Python
+    int) of the recipes that use it; recipes are also grouped into bitsets by
+    how many ingredients they have. Ranking a pantry adds the pantry's
+    bitsets into bit-sliced counters, so each recipe's match count is worked
+    out with a few dozen whole-catalog AND/XOR operations instead of a loop
+    over recipes.
+
+    RecipeIngredient signals (including m2m_changed from `.set()`) update it
+    incrementally. Bulk inserts and other processes' writes are picked up by
+    a background rebuild once it is older than PANTRY_INDEX_TTL seconds.
+    """
+
+    tables = ("_positions", "_recipe_ids", "_ingredients", "_postings", "_by_size")
+    ttl_setting = "PANTRY_INDEX_TTL"
+
+    def __init__(self):
+        super().__init__()
+        self._positions = {}
+        self._recipe_ids = []
+        self._ingredients = {}
+        self._postings = {}
+        self._by_size = {}
+
+    def rows(self):
+        return (
+            RecipeIngredient.objects.order_by("recipe_id")
+            .values_list("recipe_id", "ingredient_id")
+            .iterator()
+        )
+
+    def load(self, pairs):
+        for recipe_id, ingredient_id in pairs:
+            if recipe_id not in self._positions:
+                self._positions[recipe_id] = len(self._recipe_ids)
+                self._recipe_ids.append(recipe_id)
+            self._ingredients.setdefault(recipe_id, set()).add(ingredient_id)
+
+        # build each bitset in one go rather than one bit at a time
+        postings, by_size = {}, {}
+        for recipe_id, ingredients in self._ingredients.items():
+            position = self._positions[recipe_id]
+            by_size.setdefault(len(ingredients), []).append(position)
+            for ingredient_id in ingredients:
+                postings.setdefault(ingredient_id, []).append(position)
+        self._postings = {k: self._bits(v) for k, v in postings.items()}
+        self._by_size = {k: self._bits(v) for k, v in by_size.items()}
+
+    def add(self, recipe_id, ingredient_id):
+        with self._lock:
+            self._record(self.add, recipe_id, ingredient_id)
+            if self._built_at is None:
+                return
+            ingredients = self._ingredients.setdefault(recipe_id, set())
+            if ingredient_id in ingredients:
+                return
+            if recipe_id not in self._positions:
+                self._positions[recipe_id] = len(self._recipe_ids)
+                self._recipe_ids.append(recipe_id)
+            bit = 1 << self._positions[recipe_id]
+            self._resize(bit, len(ingredients), len(ingredients) + 1)
+            ingredients.add(ingredient_id)
+            self._postings[ingredient_id] = self._postings.get(ingredient_id, 0) | bit
+
+    def remove(self, recipe_id, ingredient_id):
+        with self._lock:
+            self._record(self.remove, recipe_id, ingredient_id)
+            if self._built_at is None:
+                return
+            ingredients = self._ingredients.get(recipe_id, set())
+            if ingredient_id not in ingredients:
+                return
+            bit = 1 << self._positions[recipe_id]
+            self._resize(bit, len(ingredients), len(ingredients) - 1)
+            ingredients.discard(ingredient_id)
+            self._postings[ingredient_id] &= ~bit
+            if not ingredients:
+                del self._ingredients[recipe_id]
+
+    def clear_recipe(self, recipe_id):
+        with self._lock:
+            # the new tables may hold links the current ones do not
+            self._record(self.clear_recipe, recipe_id)
+            for ingredient_id in list(self._ingredients.get(recipe_id, ())):
+                self.remove(recipe_id, ingredient_id)
+
+    def rank(self, pantry, limit=20):
+        """Best `limit` recipes for `pantry` (a set of ingredient ids).
+
+        Returns (recipe_id, matched, total) tuples ordered by coverage
+        (matched / total) descending, then fewest missing, then position in
+        the index: recipes in the order the last build loaded them (by id),
+        followed by those added since.
+        """
+        self.refresh()
+        with self._lock:
+            # planes[i] holds bit i of every recipe's match count
+            planes, any_match = [], 0
+            for ingredient_id in set(pantry):
+                carry = self._postings.get(ingredient_id, 0)
+                any_match |= carry
+                for i, plane in enumerate(planes):
+                    if not carry:
+                        break
+                    planes[i], carry = plane ^ carry, plane & carry
+                if carry:
+                    planes.append(carry)
+
+            exactly = {}
+            for matched in range(1, 2 ** len(planes)):
+                mask = any_match
+                for i, plane in enumerate(planes):
+                    mask &= plane if matched >> i & 1 else ~plane
+                if mask:
+                    exactly[matched] = mask
+
+            buckets = sorted(
+                (
+                    (-matched / total, total - matched, matched, total)
+                    for matched in exactly
+                    for total in self._by_size
+                    if total >= matched
+                )
+            )
+            results = []
+            for _, _, matched, total in buckets:
+                mask = exactly[matched] & self._by_size[total]
+                while mask and len(results) < limit:
+                    low = mask & -mask
+                    recipe_id = self._recipe_ids[low.bit_length() - 1]
+                    results.append((recipe_id, matched, total))
+                    mask ^= low
+                if len(results) == limit:
+                    break
+            return results
+
+    def _resize(self, bit, old, new):
+        if old:
+            self._by_size[old] &= ~bit
+        if new:
+            self._by_size[new] = self._by_size.get(new, 0) | bit
+
+    @staticmethod
+    def _bits(positions):
+        if not positions:
+            return 0
+        buffer = bytearray(max(positions) // 8 + 1)
+        for position in positions:
+            buffer[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(buffer, "little")
+
+
+pantry_index = PantryIndex()
@@ -0,0 +1,221 @@
+import contextvars
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+
+from recipeapi.metrics import view_label
+
+HEADER = "HTTP_X_PROFILE"
+SALT = "recipeapi.profiling"
+
+
+def make_token(profiler="cprofile"):
+    """A value for the X-Profile header that profiles requests with `profiler`"""
+    if profiler not in PROFILERS:
+        raise ValueError(f"Unknown profiler {profiler!r}")
+    return signing.TimestampSigner(salt=SALT).sign(profiler)
+
+
+class CProfiler:
+    extension = "prof"
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def write(self, path):
+        self.profile.dump_stats(path)
+
+
+class SamplingProfiler:
+    """Samples the request thread's stack from a helper thread.
+
+    Cheaper than cProfile on deep call trees, and writes the collapsed-stack
+    format ("outer;inner;leaf count" per line) that flamegraph.pl and
+    speedscope read.
+    """
+
+    extension = "collapsed"
+
+    def __init__(self, interval=None):
+        self.interval = interval or getattr(
+            settings, "PROFILING_SAMPLE_INTERVAL", 0.001
+        )
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._done.set()
+        self._thread.join()
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                filename = os.path.basename(code.co_filename)
+                stack.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, "w") as out:
+            for stack, count in self.stacks.most_common():
+                out.write(f"{stack} {count}\n")
+
+
+PROFILERS = {"cprofile": CProfiler, "sampling": SamplingProfiler}
+
+
+def rotate(directory, keep):
+    """Delete the oldest profiles so at most `keep` remain"""
+    profiles = sorted(
+        (entry.stat().st_mtime, entry.path)
+        for entry in os.scandir(directory)
+        if entry.is_file() and entry.name.endswith(("prof", "collapsed"))
+    )
+    for _, path in profiles[: max(0, len(profiles) - keep)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # another worker rotated it first
+
+
+_current_run = contextvars.ContextVar("profiled_run", default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    """connection.execute_wrapper hook: count queries of the profiled request"""
+    run = _current_run.get()
+    if run is not None:
+        run.queries += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """connection_created receiver, per connection like install_query_timer"""
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+class ProfiledRun:
+    """Profile the code run inside the with block and count its queries"""
+
+    def __init__(self, profiler_class):
+        self.profiler = profiler_class()
+        self.queries = 0
+
+    def __enter__(self):
+        self.token = _current_run.set(self)
+        self.started = time.perf_counter()
+        self.profiler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.stop()
+        self.elapsed_ms = (time.perf_counter() - self.started) * 1e3
+        _current_run.reset(self.token)
+
+
+class RequestProfilingMiddleware:
+    """Profile individual requests on demand.
+
+    A request is profiled when it carries an X-Profile header signed with
+    `make_token` (see manage.py profile_token), or when it falls in the
+    PROFILING_SAMPLE_RATE fraction. The profile lands in PROFILING_DIR,
+    named after the time, view, query count and duration. Only the newest
+    PROFILING_MAX_FILES are kept. With PROFILING_ENABLED off, Django drops
+    the middleware at startup, so it costs nothing.
+
+    Works in both sync and async stacks. Under ASGI the profiler watches the
+    event loop thread, so the profile also holds whatever other requests run
+    there meanwhile, and not the ORM work handed to sync_to_async threads.
+    The query count covers those too, since it follows the request's context.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+        self.default_profiler = getattr(settings, "PROFILING_PROFILER", "cprofile")
+        self.directory = getattr(
+            settings, "PROFILING_DIR", os.path.join(settings.BASE_DIR, "profiles")
+        )
+        self.max_files = getattr(settings, "PROFILING_MAX_FILES", 200)
+        self.max_age = getattr(settings, "PROFILING_TOKEN_MAX_AGE", 3600)
+
+    def chosen_profiler(self, request):
+        token = request.META.get(HEADER)
+        if token:
+            try:
+                name = signing.TimestampSigner(salt=SALT).unsign(
+                    token, max_age=self.max_age
+                )
+            except signing.BadSignature:
+                return None
+            return PROFILERS.get(name)
+        if self.sample_rate and random.random() < self.sample_rate:
+            return PROFILERS.get(self.default_profiler)
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profiler_class = self.chosen_profiler(request)
+        if profiler_class is None:
+            return self.get_response(request)
+
+        with ProfiledRun(profiler_class) as run:
+            response = self.get_response(request)
+        return self.save(request, response, run)
+
+    async def __acall__(self, request):
+        profiler_class = self.chosen_profiler(request)
+        if profiler_class is None:
+            return await self.get_response(request)
+
+        with ProfiledRun(profiler_class) as run:
+            response = await self.get_response(request)
+        return self.save(request, response, run)
+
+    def save(self, request, response, run):
+        route = re.sub(r"[^\w.-]+", "_", view_label(request))
+        name = (
+            f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}-"
+            f"{request.method}-{route}-q{run.queries}-{run.elapsed_ms:.0f}ms."
+            f"{run.profiler.extension}"
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        run.profiler.write(os.path.join(self.directory, name))
+        rotate(self.directory, self.max_files)
+        response["X-Profile-File"] = name
+        return response
@@ -0,0 +1,87 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class RebuildingIndex:
+    """Base for the in-process indexes that are rebuilt every TTL seconds.
+
+    Subclasses name their data attributes in `tables`, fill them from
+    `rows()` in `load()`, and call `refresh()` before reading. The first read
+    builds the index; after that a stale index is rebuilt on a background
+    thread into a fresh instance whose tables are swapped in under the lock,
+    so readers keep using the old tables instead of waiting for the build.
+    Updates made while a build runs are passed to `_record()` and replayed
+    onto the new tables.
+    """
+
+    tables = ()
+    ttl_setting = None
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()
+        self._built_at = None
+        self._journal = None
+        self._rebuild_thread = None
+
+    def rows(self):
+        raise NotImplementedError
+
+    def load(self, rows):
+        raise NotImplementedError
+
+    def rebuild(self, rows=None):
+        with self._rebuild_lock:
+            with self._lock:
+                self._journal = []
+            try:
+                fresh = type(self)()
+                fresh.load(self.rows() if rows is None else rows)
+            except BaseException:
+                with self._lock:
+                    self._journal = None
+                raise
+            with self._lock:
+                for name in self.tables:
+                    setattr(self, name, getattr(fresh, name))
+                self._built_at = time.monotonic()
+                journal, self._journal = self._journal, None
+                for update, args in journal:
+                    update(*args)
+
+    def refresh(self):
+        """Build the index on first use, and start a rebuild once it is stale"""
+        ttl = getattr(settings, self.ttl_setting, 60)
+        with self._lock:
+            if self._built_at is not None:
+                if time.monotonic() - self._built_at > ttl and not (
+                    self._rebuild_thread and self._rebuild_thread.is_alive()
+                ):
+                    self._rebuild_thread = threading.Thread(
+                        target=self._rebuild_in_background,
+                        name=f"{type(self).__name__}-rebuild",
+                        daemon=True,
+                    )
+                    self._rebuild_thread.start()
+                return
+        self.rebuild()  # nothing to serve until the first build is done
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception:
+            # the old tables stay in use; the next read after the TTL retries
+            logger.exception("Rebuilding %s failed", type(self).__name__)
+        finally:
+            connection.close()  # the connection this thread opened
+
+    def _record(self, update, *args):
+        """Remember an update so a rebuild in progress can replay it"""
+        if self._journal is not None:
+            self._journal.append((update, args))
@@ -0,0 +1,201 @@
+from django.db import connection, transaction
+from rest_framework import serializers
+
+from recipeapi.models import Ingredient, Recipe, RecipeIngredient
+from recipeapi.models.ingredient import normalize_name
+from recipeapi.pantry_index import pantry_index
+from recipeapi.response_cache import invalidate_recipes
+from recipeapi.similarity import refresh_signatures
+
+
+class BulkRecipeSerializer(serializers.Serializer):
+    """One item of a bulk write: a new recipe, or an update when `id` is given.
+
+    `ingredients` holds ingredient ids or names ({"name": ...} or a string);
+    leaving it out of an update keeps the recipe's current ingredients.
+    """
+
+    id = serializers.IntegerField(required=False)
+    description = serializers.CharField(max_length=255, required=False)
+    summary = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    ingredients = serializers.ListField(child=serializers.JSONField(), required=False)
+
+    def validate_ingredients(self, value):
+        for item in value:
+            if isinstance(item, bool) or not isinstance(item, (int, str, dict)):
+                raise serializers.ValidationError(
+                    'Ingredients must be ids, names or {"name": ...} objects'
+                )
+            if isinstance(item, dict) and not isinstance(item.get("name"), str):
+                raise serializers.ValidationError("Ingredient objects need a name")
+        return value
+
+    def validate(self, attrs):
+        if "id" not in attrs and not attrs.get("description"):
+            raise serializers.ValidationError(
+                {"description": "Description is required"}
+            )
+        return attrs
+
+
+def validate_items(user, items):
+    """Validate every item before anything is written.
+
+    Returns (cleaned items, errors) where errors is a list of
+    {"index": i, "errors": {...}} for the items that failed.
+    """
+    serializer = BulkRecipeSerializer(data=items, many=True)
+    serializer.is_valid()
+    item_errors = serializer.errors or []
+    # newer DRF reports list errors as {index: errors}, older as a list
+    if isinstance(item_errors, dict):
+        item_errors = sorted(item_errors.items())
+    else:
+        item_errors = enumerate(item_errors)
+    errors = [{"index": i, "errors": e} for i, e in item_errors if e]
+    if errors:
+        return None, errors
+    cleaned = serializer.validated_data
+
+    update_ids = [item["id"] for item in cleaned if "id" in item]
+    owned = set(
+        Recipe.objects.filter(pk__in=update_ids, user=user).values_list("id", flat=True)
+    )
+    ingredient_ids = {
+        ingredient
+        for item in cleaned
+        for ingredient in item.get("ingredients", [])
+        if isinstance(ingredient, int)
+    }
+    known = set(
+        Ingredient.objects.filter(pk__in=ingredient_ids).values_list("id", flat=True)
+    )
+    seen = set()
+    for i, item in enumerate(cleaned):
+        item_errors = {}
+        if "id" in item and item["id"] not in owned:
+            item_errors["id"] = "Recipe not found or not owned by you"
+        elif "id" in item and item["id"] in seen:
+            item_errors["id"] = "Recipe is updated more than once in this batch"
+        seen.add(item.get("id"))
+        unknown = [
+            ingredient
+            for ingredient in item.get("ingredients", [])
+            if isinstance(ingredient, int) and ingredient not in known
+        ]
+        if unknown:
+            item_errors["ingredients"] = f"Unknown ingredient ids: {unknown}"
+        if item_errors:
+            errors.append({"index": i, "errors": item_errors})
+    return (None, errors) if errors else (cleaned, [])
+
+
+def update_recipe_sql():
+    quote = connection.ops.quote_name
+    return "UPDATE {} SET {} = %s, {} = %s WHERE {} = %s".format(
+        quote(Recipe._meta.db_table),
+        quote(Recipe._meta.get_field("description").column),
+        quote(Recipe._meta.get_field("summary").column),
+        quote(Recipe._meta.pk.column),
+    )
+
+
+def delete_links_sql():
+    quote = connection.ops.quote_name
+    return "DELETE FROM {} WHERE {} = %s".format(
+        quote(RecipeIngredient._meta.db_table),
+        quote(RecipeIngredient._meta.get_field("recipe").column),
+    )
+
+
+def write_items(user, items):
+    """Create and update recipes from validated items in one transaction.
+
+    Ingredients, new recipes and ingredient links are each written with a
+    single bulk_create; updates go through one executemany. Returns one
+    {"index", "id", "status"} result per item.
+    """
+    names = [
+        ingredient if isinstance(ingredient, str) else ingredient["name"]
+        for item in items
+        for ingredient in item.get("ingredients", [])
+        if not isinstance(ingredient, int)
+    ]
+
+    with transaction.atomic():
+        by_name = {
+            ingredient.normalized_name: ingredient.id
+            for ingredient in Ingredient.objects.resolve_names(names)
+        }
+
+        new_recipes = [
+            Recipe(
+                user=user, description=item["description"], summary=item.get("summary")
+            )
+            for item in items
+            if "id" not in item
+        ]
+        Recipe.objects.bulk_create(new_recipes)
+        created = iter(new_recipes)
+
+        updated = Recipe.objects.in_bulk([item["id"] for item in items if "id" in item])
+        results, links, relinked = [], [], []
+        for i, item in enumerate(items):
+            if "id" in item:
+                recipe = updated[item["id"]]
+                if item.get("description"):
+                    recipe.description = item["description"]
+                if "summary" in item:
+                    recipe.summary = item["summary"]
+                results.append({"index": i, "id": recipe.id, "status": "updated"})
+            else:
+                recipe = next(created)
+                results.append({"index": i, "id": recipe.id, "status": "created"})
+
+            if "ingredients" not in item:
+                continue
+            relinked.append(recipe.id)
+            ingredient_ids = []
+            for ingredient in item["ingredients"]:
+                if isinstance(ingredient, int):
+                    ingredient_ids.append(ingredient)
+                else:
+                    name = (
+                        ingredient
+                        if isinstance(ingredient, str)
+                        else ingredient["name"]
+                    )
+                    ingredient_ids.append(by_name.get(normalize_name(name)))
+            links.extend(
+                RecipeIngredient(recipe_id=recipe.id, ingredient_id=ingredient_id)
+                for ingredient_id in dict.fromkeys(ingredient_ids)
+                if ingredient_id is not None
+            )
+
+        # bulk_update's per-row CASE expressions grow quadratically with the
+        # batch, so updates go out as one executemany of a plain UPDATE
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                update_recipe_sql(),
+                [
+                    (recipe.description, recipe.summary, recipe.id)
+                    for recipe in updated.values()
+                ],
+            )
+            # a plain DELETE: per-row post_delete signals would expire the
+            # cache and pantry index once per link, and both are refreshed
+            # below anyway
+            cursor.executemany(
+                delete_links_sql(), [(recipe_id,) for recipe_id in relinked]
+            )
+        RecipeIngredient.objects.bulk_create(links)
+
+    # bulk writes skip model signals, so refresh the derived data explicitly
+    recipe_ids = [result["id"] for result in results]
+    refresh_signatures(relinked)
+    for recipe_id in relinked:
+        pantry_index.clear_recipe(recipe_id)
+    for link in links:
+        pantry_index.add(link.recipe_id, link.ingredient_id)
+    invalidate_recipes(recipe_ids, [user.id])
+    return results
@@ -0,0 +1,153 @@
+import json
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from recipeapi.models import Recipe, RecipeIngredient, RecipePicture
+from recipeapi.recipe_bulk import validate_items, write_items
+from recipeapi.response_cache import invalidate_recipes
+
+
+class NDJSONError(Exception):
+    pass
+
+
+def export_recipes(out, batch_size=1000, progress=None):
+    """Write the catalog to `out` as one JSON object per line.
+
+    Recipes are read in id order one batch at a time, so memory stays flat no
+    matter how large the catalog is. Each line looks like
+    {"user": username, "description", "summary", "ingredients": [names],
+    "pictures": [{"image", "is_primary"}]}. Returns the number of recipes.
+    """
+    last_id, done = 0, 0
+    while True:
+        recipes = list(
+            Recipe.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "user__username", "description", "summary")[:batch_size]
+        )
+        if not recipes:
+            return done
+        recipe_ids = [row[0] for row in recipes]
+
+        ingredients, pictures = {}, {}
+        for recipe_id, name in (
+            RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+            .order_by("id")
+            .values_list("recipe_id", "ingredient__name")
+        ):
+            ingredients.setdefault(recipe_id, []).append(name)
+        for recipe_id, image, is_primary in (
+            RecipePicture.objects.filter(
+                recipe_id__in=recipe_ids, status=RecipePicture.READY
+            )
+            .exclude(image="")
+            .order_by("id")
+            .values_list("recipe_id", "image", "is_primary")
+        ):
+            pictures.setdefault(recipe_id, []).append(
+                {"image": image, "is_primary": is_primary}
+            )
+
+        for recipe_id, username, description, summary in recipes:
+            record = {
+                "user": username,
+                "description": description,
+                "summary": summary,
+                "ingredients": ingredients.get(recipe_id, []),
+                "pictures": pictures.get(recipe_id, []),
+            }
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        last_id = recipe_ids[-1]
+        done += len(recipes)
+        if progress:
+            progress(done)
+
+
+def read_records(lines):
+    """Parse NDJSON lines, yielding (line number, record) and skipping blanks"""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise NDJSONError(f"Line {number}: invalid JSON ({e})") from e
+        if not isinstance(record, dict):
+            raise NDJSONError(f"Line {number}: expected a JSON object")
+        yield number, record
+
+
+def import_recipes(
+    lines, batch_size=1000, username=None, create_users=False, progress=None
+):
+    """Create recipes from NDJSON lines in the format `export_recipes` writes.
+
+    Lines are consumed `batch_size` at a time and each batch is written in its
+    own transaction through the bulk-write path, so ingredients are resolved
+    by name and every table gets one insert per batch. `username` assigns
+    every recipe to that user instead of the one named on the line. Unknown
+    users are an error unless `create_users` is set. Returns the number of
+    recipes created.
+    """
+    records = read_records(lines)
+    done = 0
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return done
+        with transaction.atomic():
+            import_batch(batch, username, create_users)
+        done += len(batch)
+        if progress:
+            progress(done)
+
+
+def import_batch(batch, username, create_users):
+    by_user = {}
+    for number, record in batch:
+        owner = username or record.get("user")
+        if not isinstance(owner, str) or not owner:
+            raise NDJSONError(f"Line {number}: missing user")
+        by_user.setdefault(owner, []).append((number, record))
+
+    users = User.objects.in_bulk(list(by_user), field_name="username")
+    missing = [name for name in by_user if name not in users]
+    if missing and not create_users:
+        number = by_user[missing[0]][0][0]
+        raise NDJSONError(f"Line {number}: unknown user {missing[0]!r}")
+    for name in missing:
+        users[name] = User.objects.create_user(username=name)
+
+    pictures = []
+    for owner, records in by_user.items():
+        items = [
+            {
+                "description": record.get("description"),
+                "summary": record.get("summary"),
+                "ingredients": record.get("ingredients") or [],
+            }
+            for _, record in records
+        ]
+        cleaned, errors = validate_items(users[owner], items)
+        if errors:
+            error = errors[0]
+            raise NDJSONError(f"Line {records[error['index']][0]}: {error['errors']}")
+        results = write_items(users[owner], cleaned)
+        for result, (_, record) in zip(results, records):
+            pictures.extend(
+                RecipePicture(
+                    recipe_id=result["id"],
+                    image=picture["image"],
+                    is_primary=bool(picture.get("is_primary")),
+                )
+                for picture in record.get("pictures") or []
+                if isinstance(picture, dict) and picture.get("image")
+            )
+
+    if pictures:
+        RecipePicture.objects.bulk_create(pictures)
+        invalidate_recipes({picture.recipe_id for picture in pictures})
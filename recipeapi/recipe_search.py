@@ -0,0 +1,109 @@
+import base64
+import json
+import re
+
+from django.db import connection
+
+FTS_TABLE = "recipeapi_recipe_fts"
+
+# bm25 column weights: a hit in the description counts double one in the summary
+SEARCH_SQL = f"""
+    SELECT id, score, snippet FROM (
+        SELECT rowid AS id,
+               bm25({FTS_TABLE}, 2.0, 1.0) AS score,
+               snippet({FTS_TABLE}, -1, '<mark>', '</mark>', '…', 12) AS snippet
+        FROM {FTS_TABLE}
+        WHERE {FTS_TABLE} MATCH %s
+    )
+    WHERE score > %s OR (score = %s AND id > %s)
+    ORDER BY score, id
+    LIMIT %s
+"""
+
+
+# Same triggers as migrations 0008 and 0012. SQLite drops triggers whenever
+# Django rebuilds recipeapi_recipe to alter it, so migrations that do that
+# recreate them (with their own copy of this SQL), and rebuild_search_index()
+# does too. The update trigger only fires for the indexed columns.
+TRIGGERS_SQL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON recipeapi_recipe
+    BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, description, summary)
+        VALUES (new.id, new.description, new.summary);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON recipeapi_recipe
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, summary)
+        VALUES ('delete', old.id, old.description, old.summary);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF description, summary ON recipeapi_recipe
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, summary)
+        VALUES ('delete', old.id, old.description, old.summary);
+        INSERT INTO {FTS_TABLE}(rowid, description, summary)
+        VALUES (new.id, new.description, new.summary);
+    END
+    """,
+]
+
+
+def install_triggers():
+    """(Re)create the sync triggers; a no-op when they already exist"""
+    with connection.cursor() as db:
+        for statement in TRIGGERS_SQL:
+            db.execute(statement)
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def match_expression(text):
+    """Turn free text into an FTS5 query: every word must match, as a prefix"""
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def encode_cursor(score, pk):
+    return base64.urlsafe_b64encode(json.dumps([score, pk]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        score, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), int(pk)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def search_recipes(text, cursor=None, limit=20):
+    """Rank recipes matching `text` by BM25, one keyset page at a time.
+
+    Returns (rows, next_cursor) where rows are (id, score, snippet) tuples,
+    best match first. Pages continue after the (score, id) in `cursor`.
+    """
+    expression = match_expression(text)
+    if not expression:
+        return [], None
+    score, pk = decode_cursor(cursor) if cursor else (float("-inf"), 0)
+    with connection.cursor() as db:
+        db.execute(SEARCH_SQL, [expression, score, score, pk, limit + 1])
+        rows = db.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    return rows, next_cursor
+
+
+def rebuild_search_index():
+    """Reinstall the triggers and repopulate the FTS index in one pass"""
+    install_triggers()
+    with connection.cursor() as db:
+        db.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        db.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
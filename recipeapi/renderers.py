@@ -0,0 +1,34 @@
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # optional; JSONRenderer's stdlib encoder is the fallback
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson when ORJSON_RENDERING is on.
+
+    The output is the same compact UTF-8 JSON DRF produces. Values orjson
+    does not know (Decimal, lazy translation strings) go through DRF's
+    encoder. Indented (browsable API) output and installs without orjson
+    use the stdlib encoder.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or not getattr(settings, "ORJSON_RENDERING", True)
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        ret = orjson.dumps(
+            data, default=self.encoder_class().default, option=orjson.OPT_NON_STR_KEYS
+        )
+        # escaped like JSONRenderer does, so the JSON is also valid JavaScript
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
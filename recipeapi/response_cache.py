@@ -0,0 +1,155 @@
+import functools
+import hashlib
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipeapi.db_router import reading_from_replica
+from recipeapi.models import FavoriteRecipe, Recipe
+
+
+def get_cache():
+    return caches[getattr(settings, "RESPONSE_CACHE_ALIAS", "default")]
+
+
+def recipe_scope(recipe_id):
+    return f"version:recipe:{recipe_id}"
+
+
+def my_recipes_scope(user_id):
+    return f"version:my-recipes:{user_id}"
+
+
+def get_version(scope):
+    cache = get_cache()
+    version = cache.get(scope)
+    if version is None:
+        # a fresh token rather than a counter, so an evicted version can never
+        # come back with a number an old response was cached under
+        cache.add(scope, time.time_ns(), None)
+        version = cache.get(scope)
+    return version
+
+
+async def aget_version(scope):
+    cache = get_cache()
+    version = await cache.aget(scope)
+    if version is None:
+        await cache.aadd(scope, time.time_ns(), None)
+        version = await cache.aget(scope)
+    return version
+
+
+def bump(scopes):
+    token = time.time_ns()
+    get_cache().set_many({scope: token for scope in scopes}, None)
+
+
+def invalidate_recipes(recipe_ids, extra_user_ids=()):
+    """Expire cached reads of these recipes and of everyone's lists holding them.
+
+    A recipe appears in its owner's and in each favoriting user's
+    my-recipes list, and its payload embeds the full favorites list, so all
+    of those users' list versions move with it.
+    """
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    user_ids = set(extra_user_ids)
+    user_ids.update(
+        Recipe.objects.filter(pk__in=recipe_ids).values_list("user_id", flat=True)
+    )
+    user_ids.update(
+        FavoriteRecipe.objects.filter(recipe_id__in=recipe_ids).values_list(
+            "user_id", flat=True
+        )
+    )
+    scopes = [recipe_scope(pk) for pk in recipe_ids]
+    scopes += [my_recipes_scope(pk) for pk in user_ids]
+    # bump again after commit so a read racing the write cannot re-cache the
+    # old data under the new version
+    bump(scopes)
+    transaction.on_commit(lambda: bump(scopes))
+
+
+def response_key(request, version):
+    """(ETag, cache key) of `request`'s response at `version`"""
+    fingerprint = hashlib.sha256(
+        f"{request.user.id}:{request.build_absolute_uri()}:{version}".encode()
+    ).hexdigest()
+    return f'"{fingerprint}"', f"response:{fingerprint}"
+
+
+def cached_response(request, data, etag):
+    if etag in request.headers.get("If-None-Match", ""):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data, status=status.HTTP_200_OK)
+    return tag(response, etag)
+
+
+def timeout():
+    return getattr(settings, "RESPONSE_CACHE_TIMEOUT", 300)
+
+
+def cacheable(response):
+    return response.status_code == status.HTTP_200_OK and not reading_from_replica()
+
+
+def tag(response, etag):
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def cache_response(scope):
+    """Cache a view's 200 responses per user and resource version.
+
+    `scope(request, **kwargs)` names the version the response depends on.
+    Responses carry a strong ETag derived from user, URL and that version. A
+    matching If-None-Match is answered with 304 straight from the cache, and
+    a cached body is returned without running the view. Bodies read from a
+    replica may lag the version they would be filed under, so those are
+    neither cached nor tagged. Async views are wrapped with the cache's
+    async API.
+    """
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+
+            @functools.wraps(view)
+            async def async_wrapper(self, request, *args, **kwargs):
+                version = await aget_version(scope(request, **kwargs))
+                etag, entry_key = response_key(request, version)
+                data = await get_cache().aget(entry_key)
+                if data is not None:
+                    return cached_response(request, data, etag)
+                response = await view(self, request, *args, **kwargs)
+                if not cacheable(response):
+                    return response
+                await get_cache().aset(entry_key, response.data, timeout())
+                return tag(response, etag)
+
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(self, request, *args, **kwargs):
+            version = get_version(scope(request, **kwargs))
+            etag, entry_key = response_key(request, version)
+            data = get_cache().get(entry_key)
+            if data is not None:
+                return cached_response(request, data, etag)
+            response = view(self, request, *args, **kwargs)
+            if not cacheable(response):
+                return response
+            get_cache().set(entry_key, response.data, timeout())
+            return tag(response, etag)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,139 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipeapi.authentication import forget_token, forget_user
+from recipeapi.ingredient_index import ingredient_index
+from recipeapi.metrics import install_query_timer
+from recipeapi.profiling import install_query_counter
+from recipeapi.models import (
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipePicture,
+)
+from recipeapi.pantry_index import pantry_index
+from recipeapi.response_cache import invalidate_recipes
+
+connection_created.connect(install_query_timer)
+connection_created.connect(install_query_counter)
+
+
+@receiver(post_delete, sender=RecipePicture)
+def release_picture_file(sender, instance, **kwargs):
+    """Delete a content-addressed image once no RecipePicture references it"""
+    name = instance.image.name
+    transaction.on_commit(lambda: RecipePicture.release_image(name))
+
+
+@receiver(post_save, sender=Ingredient)
+def index_ingredient(sender, instance, **kwargs):
+    ingredient_index.add(instance.pk, instance.name)
+
+
+@receiver(post_delete, sender=Ingredient)
+def unindex_ingredient(sender, instance, **kwargs):
+    ingredient_index.remove(instance.pk)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def index_recipe_ingredient(sender, instance, **kwargs):
+    pantry_index.add(instance.recipe_id, instance.ingredient_id)
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def unindex_recipe_ingredient(sender, instance, **kwargs):
+    pantry_index.remove(instance.recipe_id, instance.ingredient_id)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def reindex_recipe_ingredients(sender, instance, action, reverse, pk_set, **kwargs):
+    """Follow recipe.ingredients.add/remove/set/clear, which bypass post_save"""
+    if action == "pre_clear":
+        if reverse:
+            for recipe_id in instance.recipes.values_list("id", flat=True):
+                pantry_index.remove(recipe_id, instance.pk)
+        else:
+            pantry_index.clear_recipe(instance.pk)
+        return
+    if action not in ("post_add", "post_remove"):
+        return
+    update = pantry_index.add if action == "post_add" else pantry_index.remove
+    for pk in pk_set:
+        if reverse:
+            update(pk, instance.pk)
+        else:
+            update(instance.pk, pk)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def expire_recipe(sender, instance, **kwargs):
+    invalidate_recipes([instance.pk], [instance.user_id])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=RecipePicture)
+@receiver(post_delete, sender=RecipePicture)
+def expire_recipe_part(sender, instance, **kwargs):
+    invalidate_recipes([instance.recipe_id])
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_delete, sender=FavoriteRecipe)
+def expire_favorite(sender, instance, **kwargs):
+    invalidate_recipes([instance.recipe_id], [instance.user_id])
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def expire_recipe_ingredients(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        invalidate_recipes([instance.pk])
+    elif pk_set:
+        invalidate_recipes(pk_set)
+
+
+@receiver(post_save, sender=Ingredient)
+def expire_ingredient_recipes(sender, instance, created, **kwargs):
+    """A renamed ingredient changes the payload of every recipe using it"""
+    if not created:
+        invalidate_recipes(
+            RecipeIngredient.objects.filter(ingredient=instance).values_list(
+                "recipe_id", flat=True
+            )
+        )
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def expire_cached_token(sender, instance, **kwargs):
+    forget_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def expire_cached_user(sender, instance, created, **kwargs):
+    if not created:
+        forget_user(instance.pk)
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+def count_new_favorite(sender, instance, created, **kwargs):
+    if created:
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            favorites_count=F("favorites_count") + 1
+        )
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+def count_removed_favorite(sender, instance, **kwargs):
+    Recipe.objects.filter(pk=instance.recipe_id, favorites_count__gt=0).update(
+        favorites_count=F("favorites_count") - 1
+    )
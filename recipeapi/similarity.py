@@ -0,0 +1,120 @@
+import random
+from array import array
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from recipeapi.models import RecipeBand, RecipeIngredient, RecipeSignature
+
+# 64 MinHash values split into 32 bands of 2 rows. Two recipes share at least
+# one bucket with probability 1 - (1 - J^2)^32, i.e. ~50% at Jaccard 0.15 and
+# ~99.9% at Jaccard 0.5.
+NUM_HASHES = 64
+BANDS = 32
+ROWS = NUM_HASHES // BANDS
+MERSENNE_PRIME = (1 << 61) - 1
+
+_rng = random.Random(0x5EED)  # fixed, so stored signatures stay comparable
+HASH_PARAMS = [
+    (_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+    for _ in range(NUM_HASHES)
+]
+
+
+def minhash(ingredient_ids):
+    """MinHash signature of a set of ingredient ids, as an array of uint64"""
+    return array(
+        "Q",
+        (
+            min((a * x + b) % MERSENNE_PRIME for x in ingredient_ids)
+            for a, b in HASH_PARAMS
+        ),
+    )
+
+
+def band_buckets(signature):
+    # tuple hashes of ints are stable across processes and fit in a BigInteger
+    return [
+        (band, hash(tuple(signature[band * ROWS : (band + 1) * ROWS])))
+        for band in range(BANDS)
+    ]
+
+
+def unpack(minhash_bytes):
+    signature = array("Q")
+    signature.frombytes(minhash_bytes)
+    return signature
+
+
+def refresh_signatures(recipe_ids):
+    """Recompute the signatures and LSH bands of `recipe_ids` from their ingredients"""
+    ingredients = {}
+    for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list("recipe_id", "ingredient_id"):
+        ingredients.setdefault(recipe_id, set()).add(ingredient_id)
+
+    signatures, bands = [], []
+    for recipe_id, ingredient_ids in ingredients.items():
+        signature = minhash(ingredient_ids)
+        signatures.append(
+            RecipeSignature(recipe_id=recipe_id, minhash=signature.tobytes())
+        )
+        bands.extend(
+            (recipe_id, band, bucket) for band, bucket in band_buckets(signature)
+        )
+
+    # 32 rows per recipe: building a model instance for each one costs far more
+    # than the insert itself, so bands go in as plain parameter tuples
+    insert_bands = "INSERT INTO {} ({}, {}, {}) VALUES (%s, %s, %s)".format(
+        *map(
+            connection.ops.quote_name,
+            (
+                RecipeBand._meta.db_table,
+                RecipeBand._meta.get_field("recipe").column,
+                RecipeBand._meta.get_field("band").column,
+                RecipeBand._meta.get_field("bucket").column,
+            ),
+        )
+    )
+    with transaction.atomic():
+        RecipeSignature.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeBand.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeSignature.objects.bulk_create(signatures)
+        with connection.cursor() as cursor:
+            cursor.executemany(insert_bands, bands)
+
+
+def similar_recipes(recipe_id, limit=10, max_candidates=500):
+    """Recipes whose ingredient sets look most like `recipe_id`'s.
+
+    Candidates come from the (band, bucket) index rather than a scan of the
+    catalog; the `max_candidates` sharing the most buckets are then ranked by
+    their estimated Jaccard similarity. Returns (recipe_id, similarity) pairs.
+    """
+    try:
+        signature = unpack(RecipeSignature.objects.get(recipe_id=recipe_id).minhash)
+    except RecipeSignature.DoesNotExist:
+        return []
+
+    same_bucket = Q()
+    for band, bucket in band_buckets(signature):
+        same_bucket |= Q(band=band, bucket=bucket)
+    candidates = (
+        RecipeBand.objects.filter(same_bucket)
+        .exclude(recipe_id=recipe_id)
+        .values("recipe_id")
+        .annotate(shared=Count("id"))
+        .order_by("-shared", "recipe_id")
+        .values_list("recipe_id", flat=True)[:max_candidates]
+    )
+
+    scored = []
+    for other_id, minhash_bytes in RecipeSignature.objects.filter(
+        recipe_id__in=list(candidates)
+    ).values_list("recipe_id", "minhash"):
+        other = unpack(minhash_bytes)
+        agreeing = sum(1 for mine, theirs in zip(signature, other) if mine == theirs)
+        scored.append((-agreeing / NUM_HASHES, other_id))
+    scored.sort()
+    return [(other_id, -score) for score, other_id in scored[:limit]]
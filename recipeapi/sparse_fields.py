@@ -0,0 +1,45 @@
+from rest_framework import serializers
+
+
+def requested_fields(request, param="fields"):
+    """The comma-separated names in ?fields= (or `param`), None when absent"""
+    query_params = getattr(request, "query_params", None)
+    if query_params is None or param not in query_params:
+        return None
+    return {name.strip() for name in query_params[param].split(",") if name.strip()}
+
+
+class SparseFieldsMixin:
+    """Let the request pick which fields a top-level serializer renders.
+
+    `?fields=id,description` renders just those fields. A nested relation
+    listed in `fields` renders as a list of primary keys unless it is also
+    named in `?expand=`. Without `fields` everything is rendered as before,
+    except `optional_fields`, which only appear when asked for. Serializers
+    nested inside another are built without a request and are left alone.
+    """
+
+    optional_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        fields = requested_fields(request)
+        if fields is None:
+            for name in self.optional_fields:
+                self.fields.pop(name)
+            return
+
+        unknown = fields - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError(
+                {"fields": [f"Unknown field: {name}" for name in sorted(unknown)]}
+            )
+        expand = requested_fields(request, "expand") or set()
+        for name, field in list(self.fields.items()):
+            if name not in fields:
+                self.fields.pop(name)
+            elif name not in expand and isinstance(field, serializers.ListSerializer):
+                self.fields[name] = serializers.PrimaryKeyRelatedField(
+                    many=True, read_only=True
+                )
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+from contextlib import contextmanager
+
+from django.core.files import locks
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+CHUNK_SIZE = 64 * 1024
+DIGEST_NAME = re.compile(r"(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$")
+LOCK_DIR = ".locks"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File storage that names each file after the SHA-256 of its content.
+
+    `recipe_images/x.jpg` is stored as `recipe_images/ab/ab12....jpg`. The
+    digest is computed while the upload is staged, and a blob that is already
+    on disk is not written again. Identical images therefore share one file,
+    referenced by every RecipePicture that uses it.
+
+    Reusing a blob and deleting an unreferenced one are check-then-act steps,
+    so both run under a per-digest file lock (shared across processes). A new
+    picture that reused a blob can still lose it to a delete that checked for
+    references before the picture's row was committed; `restore()`, called
+    once the row is committed, writes the content back in that case.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # _save picks the final name from the content, so never suffix it
+        return name
+
+    def is_content_addressed(self, name):
+        return bool(DIGEST_NAME.search(name))
+
+    @contextmanager
+    def lock(self, name):
+        """Hold the lock guarding the blob `name` (striped by digest prefix)"""
+        path = self.path(posixpath.join(LOCK_DIR, posixpath.basename(name)[:2]))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a") as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(lock_file)
+
+    def delete_unreferenced(self, name, is_referenced):
+        """Delete blob `name` unless is_referenced(); True if it was deleted"""
+        with self.lock(name):
+            if is_referenced():
+                return False
+            self.delete(name)
+        return True
+
+    def restore(self, name, content):
+        """Write `content` back as blob `name` if it was deleted meanwhile"""
+        with self.lock(name):
+            if os.path.exists(self.path(name)):
+                return
+        directory, basename = posixpath.split(name)
+        # _save files the content under <upload dir>/<digest prefix>/
+        self._save(posixpath.join(posixpath.dirname(directory), basename), content)
+
+    def _save(self, name, content):
+        directory, basename = posixpath.split(name)
+        ext = os.path.splitext(basename)[1].lower()
+        staging_dir = self.path(directory)
+        os.makedirs(staging_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        if hasattr(content, "temporary_file_path"):
+            staged = None
+            with open(content.temporary_file_path(), "rb") as source:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+        else:
+            with tempfile.NamedTemporaryFile(dir=staging_dir, delete=False) as out:
+                staged = out.name
+                for chunk in content.chunks(CHUNK_SIZE):
+                    digest.update(chunk)
+                    out.write(chunk)
+
+        hexdigest = digest.hexdigest()
+        final_name = posixpath.join(directory, hexdigest[:2], hexdigest + ext)
+        full_path = self.path(final_name)
+        with self.lock(final_name):
+            if os.path.exists(full_path):
+                if staged:
+                    os.remove(staged)
+                return final_name
+
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if staged:
+                os.replace(staged, full_path)
+            else:
+                file_move_safe(
+                    content.temporary_file_path(), full_path, allow_overwrite=True
+                )
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+        return final_name
+
+
+picture_storage = ContentAddressedStorage()
+
+
+def get_picture_storage():
+    return picture_storage
@@ -0,0 +1,212 @@
+import random
+from io import BytesIO
+from itertools import accumulate
+
+from PIL import Image
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from recipeapi.models import (
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipePicture,
+)
+from recipeapi.similarity import refresh_signatures
+from recipeapi.storage import picture_storage
+
+USERNAME_PREFIX = "synthetic-"
+PASSWORD = "synthetic"
+
+QUALIFIERS = [
+    "fresh", "dried", "smoked", "roasted", "ground", "pickled", "toasted",
+    "wild", "sweet", "hot", "baby", "red", "green", "black", "white", "golden",
+]  # fmt: skip
+BASES = [
+    "garlic", "onion", "tomato", "basil", "thyme", "pepper", "paprika", "rice",
+    "lentils", "chickpeas", "spinach", "mushroom", "carrot", "potato", "lemon",
+    "lime", "ginger", "cumin", "coriander", "chili", "butter", "cream", "cheese",
+    "flour", "sugar", "honey", "almonds", "walnuts", "salmon", "chicken", "beef",
+    "tofu", "noodles", "beans", "corn", "peas", "apple", "pear", "oats", "yogurt",
+]  # fmt: skip
+DISHES = [
+    "soup", "stew", "curry", "salad", "pie", "tart", "risotto", "pasta", "bake",
+    "stir-fry", "tacos", "bowl", "casserole", "skewers", "pancakes", "bread",
+]  # fmt: skip
+STYLES = ["Easy", "Weeknight", "Grandma's", "Spicy", "Creamy", "Rustic", "Quick"]
+
+
+def zipf_weights(count, exponent=1.0):
+    """Cumulative rank-based popularity for `random.choices(cum_weights=...)`.
+
+    The item at rank r is picked about 1/r^exponent as often as the first.
+    """
+    return list(accumulate(1 / (rank**exponent) for rank in range(1, count + 1)))
+
+
+def ingredient_names(count):
+    """`count` distinct, stable ingredient names, plain ones first"""
+    stems = list(BASES)
+    stems += [f"{qualifier} {base}" for qualifier in QUALIFIERS for base in BASES]
+    names, variant = list(stems), 2
+    while len(names) < count:
+        names += [f"{stem} no. {variant}" for stem in stems]
+        variant += 1
+    return names[:count]
+
+
+def placeholder_images(count, rng):
+    """Store `count` small solid-colour JPEGs and return their storage names"""
+    names = []
+    for _ in range(count):
+        buffer = BytesIO()
+        color = tuple(rng.randrange(256) for _ in range(3))
+        Image.new("RGB", (640, 480), color).save(buffer, "JPEG")
+        names.append(
+            picture_storage.save(
+                "recipe_images/synthetic.jpg", ContentFile(buffer.getvalue())
+            )
+        )
+    return names
+
+
+def generate_catalog(
+    users=100,
+    recipes=10_000,
+    ingredients=2_000,
+    favorites=20_000,
+    seed=1,
+    batch_size=1000,
+    progress=None,
+):
+    """Fill the database with a reproducible, skewed synthetic catalog.
+
+    The same arguments always produce the same users, ingredients and
+    recipes. Popularity follows a Zipf-like curve: a few users own most of
+    the recipes, a few staple ingredients appear in most of them, and a few
+    recipes collect most of the favorites. Users are named
+    `synthetic-000001`... with the password "synthetic" and an API token.
+    Returns the counts of rows created.
+    """
+    rng = random.Random(seed)
+
+    usernames = [f"{USERNAME_PREFIX}{i:06d}" for i in range(1, users + 1)]
+    password = make_password(PASSWORD)  # hashing is slow, so share one hash
+    User.objects.bulk_create(
+        [User(username=name, password=password) for name in usernames],
+        ignore_conflicts=True,
+    )
+    user_ids = list(
+        User.objects.filter(username__in=usernames)
+        .order_by("username")
+        .values_list("id", flat=True)
+    )
+    Token.objects.bulk_create(
+        [Token(user_id=pk, key=Token.generate_key()) for pk in user_ids],
+        ignore_conflicts=True,
+    )
+
+    ingredient_ids = []
+    names = ingredient_names(ingredients)
+    for start in range(0, len(names), batch_size):
+        ingredient_ids += [
+            ingredient.id
+            for ingredient in Ingredient.objects.resolve_names(
+                names[start : start + batch_size]
+            )
+        ]
+    if progress:
+        progress(f"{len(user_ids)} users, {len(ingredient_ids)} ingredients")
+
+    images = placeholder_images(20, rng)
+    owner_weights = zipf_weights(len(user_ids), 1.1)
+    staple_weights = zipf_weights(len(ingredient_ids))
+    recipe_ids = []
+    created_links = created_pictures = 0
+    for start in range(0, recipes, batch_size):
+        size = min(batch_size, recipes - start)
+        owners = rng.choices(user_ids, cum_weights=owner_weights, k=size)
+        batch, chosen = [], []
+        for owner in owners:
+            picked = rng.choices(ingredient_ids, cum_weights=staple_weights, k=12)
+            picked = list(dict.fromkeys(picked))[: rng.randint(3, 12)]
+            chosen.append(picked)
+            dish = f"{rng.choice(BASES).capitalize()} {rng.choice(DISHES)}"
+            batch.append(
+                Recipe(
+                    user_id=owner,
+                    description=f"{rng.choice(STYLES)} {dish}",
+                    summary=(
+                        f"A {rng.choice(QUALIFIERS)} {dish.lower()} with "
+                        f"{rng.choice(BASES)} and {rng.choice(BASES)}."
+                    ),
+                )
+            )
+        # pictures: most recipes have one, some none, a few a whole gallery
+        picture_counts = [rng.choices([0, 1, 2, 4], [2, 6, 1, 1])[0] for _ in batch]
+        with transaction.atomic():
+            Recipe.objects.bulk_create(batch)
+            links = [
+                RecipeIngredient(recipe_id=recipe.id, ingredient_id=ingredient_id)
+                for recipe, picked in zip(batch, chosen)
+                for ingredient_id in picked
+            ]
+            RecipeIngredient.objects.bulk_create(links)
+            pictures = [
+                RecipePicture(
+                    recipe_id=recipe.id, image=rng.choice(images), is_primary=i == 0
+                )
+                for recipe, count in zip(batch, picture_counts)
+                for i in range(count)
+            ]
+            RecipePicture.objects.bulk_create(pictures)
+        refresh_signatures([recipe.id for recipe in batch])
+        recipe_ids += [recipe.id for recipe in batch]
+        created_links += len(links)
+        created_pictures += len(pictures)
+        if progress:
+            progress(f"{len(recipe_ids)} recipes")
+
+    pairs = set()
+    if recipe_ids:
+        fan_weights = zipf_weights(len(user_ids), 0.8)
+        hit_weights = zipf_weights(len(recipe_ids), 1.1)
+        shuffled = recipe_ids[:]
+        rng.shuffle(shuffled)  # popularity should not follow insertion order
+        wanted = min(favorites, len(user_ids) * len(recipe_ids))
+        for _ in range(20):  # popular pairs repeat, so draw until enough are new
+            missing = wanted - len(pairs)
+            if not missing:
+                break
+            pairs.update(
+                zip(
+                    rng.choices(user_ids, cum_weights=fan_weights, k=missing),
+                    rng.choices(shuffled, cum_weights=hit_weights, k=missing),
+                )
+            )
+    pairs = sorted(pairs)
+    for start in range(0, len(pairs), batch_size):
+        FavoriteRecipe.objects.bulk_create(
+            [
+                FavoriteRecipe(user_id=user_id, recipe_id=recipe_id)
+                for user_id, recipe_id in pairs[start : start + batch_size]
+            ],
+            ignore_conflicts=True,
+        )
+    # bulk_create skips the signals that maintain the counts
+    Recipe.objects.filter(user_id__in=user_ids).recount_favorites()
+    if progress:
+        progress(f"{len(pairs)} favorites")
+
+    return {
+        "users": len(user_ids),
+        "ingredients": len(ingredient_ids),
+        "recipes": len(recipe_ids),
+        "recipe_ingredients": created_links,
+        "pictures": created_pictures,
+        "favorites": len(pairs),
+    }
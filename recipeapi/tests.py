@@ -1,3 +1,1553 @@
-from django.test import TestCase
+import base64
+import hashlib
+import json
+import os
+import pstats
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from PIL import Image
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.utils import load_backend
+from django.http import HttpResponse
+from django.test import (
+    AsyncClient,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from recipeapi.authentication import CachedTokenAuthentication, local_token_cache
+from recipeapi.benchmarks import ROUTES, BenchmarkContext, compare, run_benchmark
+from recipeapi.db_router import pin_key
+from recipeapi.image_fetch import ImageFetchError, fetch_image
+from recipeapi.image_jobs import (
+    claim_jobs,
+    complete_job,
+    fail_job,
+    run_pending_jobs,
+)
+from recipeapi.image_variants import delete_variants
+from recipeapi.ingredient_index import IngredientIndex, ingredient_index
+from recipeapi.metrics import registry as metrics_registry
+from recipeapi.pantry_index import PantryIndex, pantry_index
+from recipeapi.profiling import RequestProfilingMiddleware, make_token
+from recipeapi.renderers import ORJSONRenderer
+from recipeapi.sqlite_backend.base import RetryingCursorWrapper
+from recipeapi.storage import picture_storage
+from recipeapi.synthetic import generate_catalog
+from recipeapi.views.async_views import AsyncAPIView
+from recipeapi.models import (
+    FavoriteRecipe,
+    ImageIngestJob,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipePicture,
+)
+
+
+def make_recipes(user, count):
+    """Create recipes that each have ingredients, a picture and a favorite"""
+    ingredients = Ingredient.objects.resolve_names(
+        [f"ingredient {i}" for i in range(3)]
+    )
+    for i in range(count):
+        recipe = Recipe.objects.create(user=user, description=f"Recipe {i}")
+        recipe.ingredients.set(ingredients)
+        RecipePicture.objects.create(recipe=recipe, image="recipe_images/x.jpg")
+        FavoriteRecipe.objects.create(user=user, recipe=recipe)
+
+
+class RecipeQueryCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_list_query_count_is_constant(self):
+        for url in ["/recipes", "/recipes/my-recipes", "/recipes/favorites"]:
+            with self.subTest(url=url):
+                Recipe.objects.all().delete()
+                make_recipes(self.user, 2)
+                few = self.count_queries(url)
+                make_recipes(self.user, 10)
+                many = self.count_queries(url)
+                self.assertEqual(few, many)
+
+    def test_list_annotates_owner_and_favorite(self):
+        other = User.objects.create_user(username="other", password="pw")
+        mine = Recipe.objects.create(user=self.user, description="Mine")
+        theirs = Recipe.objects.create(user=other, description="Theirs")
+        FavoriteRecipe.objects.create(user=self.user, recipe=theirs)
+
+        response = self.client.get("/recipes")
+        flags = {
+            row["id"]: (row["is_owner"], row["is_favorite"])
+            for row in response.data["results"]
+        }
+        self.assertEqual(flags[mine.id], (True, False))
+        self.assertEqual(flags[theirs.id], (False, True))
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def collect_pages(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row["id"] for row in response.data["results"])
+            url = response.data["next"]
+        return ids
+
+    def test_recipes_page_through_every_row_once(self):
+        make_recipes(self.user, 7)
+        ids = self.collect_pages("/recipes?page_size=3")
+        expected = Recipe.objects.order_by("id").values_list("id", flat=True)
+        self.assertEqual(ids, list(expected))
+
+    def test_ingredients_are_paginated(self):
+        for i in range(5):
+            Ingredient.objects.create(name=f"ingredient {i}")
+        response = self.client.get("/ingredients?page_size=2")
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNotNone(response.data["next"])
+        self.assertEqual(len(self.collect_pages("/ingredients?page_size=2")), 5)
+
+
+class StubImageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/slow"):
+            time.sleep(0.3)
+        body = b"x" * (4096 if self.path.startswith("/big") else 100)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        if not self.path.startswith("/big-unsized"):
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            if self.path.startswith("/trickle"):
+                for i in range(0, len(body), 10):
+                    self.wfile.write(body[i : i + 10])
+                    self.wfile.flush()
+                    time.sleep(0.05)
+            else:
+                self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up on an oversized body
+
+    def log_message(self, *args):
+        pass
+
+
+class StubImageServerMixin:
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubImageHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+
+class ImageFetchTests(StubImageServerMixin, SimpleTestCase):
+    @override_settings(IMAGE_FETCH_MAX_BYTES=1024)
+    def test_oversized_images_are_rejected(self):
+        for path in ["/big.jpg", "/big-unsized.jpg"]:
+            with self.subTest(path=path):
+                with self.assertRaises(ImageFetchError):
+                    fetch_image(self.base + path)
+        self.assertEqual(len(fetch_image(self.base + "/ok.jpg")), 100)
+
+    @override_settings(IMAGE_FETCH_TIMEOUT=1, IMAGE_FETCH_TOTAL_TIMEOUT=0.2)
+    def test_slow_bodies_are_cut_off_at_the_total_timeout(self):
+        # every piece arrives well within the per-read timeout
+        with self.assertRaisesMessage(ImageFetchError, "download budget"):
+            fetch_image(self.base + "/trickle.jpg")
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_FETCH_MAX_BYTES=1024)
+class ImageIngestJobTests(StubImageServerMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_recipe(self, images):
+        return self.client.post(
+            "/recipes",
+            {"description": "Toast", "ingredients": [], "images": images},
+            format="json",
+        )
+
+    def test_create_returns_pending_pictures_then_worker_fills_them(self):
+        response = self.create_recipe([self.base + "/slow.jpg", self.base + "/ok.png"])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [p["status"] for p in response.data["pictures"]], ["pending", "pending"]
+        )
+
+        self.assertEqual(run_pending_jobs(), 2)
+        pictures = RecipePicture.objects.order_by("id")
+        self.assertEqual([p.status for p in pictures], ["ready", "ready"])
+        self.assertTrue(pictures[1].image.name.endswith(".png"))
+        self.assertEqual(pictures[1].image.size, 100)
+
+    @override_settings(IMAGE_JOB_MAX_ATTEMPTS=2)
+    def test_failed_downloads_back_off_then_give_up(self):
+        self.create_recipe([self.base + "/big.jpg"])
+        run_pending_jobs()
+        job = ImageIngestJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ("pending", 1))
+        self.assertGreater(job.run_after, job.created_at)
+        self.assertEqual(run_pending_jobs(), 0)  # not due yet
+
+        ImageIngestJob.objects.update(run_after=job.created_at)
+        run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("failed", 2))
+        self.assertEqual(RecipePicture.objects.get().status, "failed")
+
+    def test_download_for_a_deleted_picture_is_dropped(self):
+        recipe_id = self.create_recipe([self.base + "/ok.png"]).data["id"]
+        [job] = claim_jobs(10)
+        self.client.delete(f"/recipes/{recipe_id}")
+
+        self.assertFalse(complete_job(job, b"x" * 100))
+        self.assertFalse(RecipePicture.objects.exists())
+        self.assertFalse(ImageIngestJob.objects.exists())
+        digest = hashlib.sha256(b"x" * 100).hexdigest()
+        self.assertFalse(
+            picture_storage.exists(f"recipe_images/{digest[:2]}/{digest}.png")
+        )
+
+    @override_settings(IMAGE_JOB_MAX_ATTEMPTS=1)
+    def test_giving_up_on_a_deleted_picture_writes_nothing(self):
+        recipe_id = self.create_recipe([self.base + "/big.jpg"]).data["id"]
+        [job] = claim_jobs(10)
+        self.client.delete(f"/recipes/{recipe_id}")
+
+        fail_job(job, ImageFetchError("too big"))
+        self.assertFalse(RecipePicture.objects.exists())
+        self.assertFalse(ImageIngestJob.objects.exists())
+
+    @override_settings(IMAGE_JOB_MAX_ATTEMPTS=1)
+    def test_giving_up_expires_the_cached_recipe(self):
+        recipe_id = self.create_recipe([self.base + "/big.jpg"]).data["id"]
+        url = f"/recipes/{recipe_id}"
+        self.assertEqual(self.client.get(url).data["pictures"][0]["status"], "pending")
+        run_pending_jobs()
+        self.assertEqual(self.client.get(url).data["pictures"][0]["status"], "failed")
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class PictureVariantTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        recipe = Recipe.objects.create(user=self.user, description="Toast")
+        buffer = BytesIO()
+        Image.new("RGB", (2000, 1000), "orange").save(buffer, "JPEG")
+        self.picture = RecipePicture.objects.create(
+            recipe=recipe, image=ContentFile(buffer.getvalue(), name="toast.jpg")
+        )
+
+    def test_serializer_exposes_variant_urls(self):
+        response = self.client.get("/recipes")
+        variants = response.data["results"][0]["pictures"][0]["variants"]
+        self.assertEqual(sorted(variants), ["1080", "160", "480"])
+        self.assertTrue(
+            variants["160"]["webp"].endswith(
+                f"/recipes/pictures/{self.picture.id}/160.webp"
+            )
+        )
+
+    def test_variant_is_rendered_once_and_cached(self):
+        url = f"/recipes/pictures/{self.picture.id}/480.webp"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        with Image.open(BytesIO(b"".join(response.streaming_content))) as img:
+            self.assertEqual(img.size, (480, 240))
+
+        cached = default_storage.listdir("recipe_variants")[1]
+        self.assertEqual(len(cached), 1)
+        self.client.get(url)
+        self.assertEqual(default_storage.listdir("recipe_variants")[1], cached)
+
+    def test_unknown_variant_is_404(self):
+        response = self.client.get(f"/recipes/pictures/{self.picture.id}/999.webp")
+        self.assertEqual(response.status_code, 404)
+
+    def test_unreadable_original_is_404(self):
+        broken = RecipePicture.objects.create(
+            recipe=self.picture.recipe,
+            image=ContentFile(b"not an image", name="broken.jpg"),
+        )
+        response = self.client.get(f"/recipes/pictures/{broken.id}/160.webp")
+        self.assertEqual(response.status_code, 404)
+
+        self.picture.image.storage.delete(self.picture.image.name)
+        delete_variants(self.picture.image.name)
+        response = self.client.get(f"/recipes/pictures/{self.picture.id}/160.webp")
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_UPLOAD_MAX_BYTES=2048)
+class PictureUploadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.recipe = Recipe.objects.create(user=self.user, description="Toast")
+
+    def upload(self, size):
+        image = SimpleUploadedFile("toast.png", b"x" * size, "image/png")
+        return self.client.post(
+            f"/recipes/{self.recipe.id}/pictures",
+            {"image": image, "is_primary": "true"},
+            format="multipart",
+        )
+
+    def test_multipart_upload_is_stored(self):
+        response = self.upload(1000)
+        self.assertEqual(response.status_code, 201)
+        picture = RecipePicture.objects.get()
+        self.assertTrue(picture.is_primary)
+        self.assertTrue(picture.image.name.endswith(".png"))
+        self.assertEqual(picture.image.size, 1000)
+
+    def test_oversized_upload_is_rejected(self):
+        response = self.upload(4096)
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(RecipePicture.objects.exists())
+
+    def test_oversized_raw_body_upload_is_rejected(self):
+        response = self.client.post(
+            f"/recipes/{self.recipe.id}/pictures",
+            b"x" * 5000,
+            content_type="image/png",
+            headers={"Content-Disposition": "attachment; filename=toast.png"},
+        )
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(RecipePicture.objects.exists())
+
+    def test_base64_update_is_still_supported(self):
+        payload = base64.b64encode(b"y" * 1500).decode()
+        response = self.client.put(
+            f"/recipes/{self.recipe.id}",
+            {"images": [f"data:image/jpeg;base64,{payload}"]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        with RecipePicture.objects.get().image.open("rb") as image:
+            self.assertEqual(image.read(), b"y" * 1500)
+
+        response = self.client.put(
+            f"/recipes/{self.recipe.id}",
+            {"images": ["data:image/jpeg;base64," + "A" * 4000]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 413)
+
+    def test_failed_update_changes_nothing(self):
+        salt = Ingredient.objects.create(name="Salt")
+        self.recipe.ingredients.set([salt])
+        picture = RecipePicture.objects.create(
+            recipe=self.recipe, image=ContentFile(b"old", name="old.jpg")
+        )
+        for body in [
+            {"ingredients": [], "images": ["data:image/jpeg;base64," + "A" * 4000]},
+            {"ingredients": [], "images": ["not a data url"]},
+        ]:
+            with self.subTest(body=body):
+                response = self.client.put(
+                    f"/recipes/{self.recipe.id}", body, format="json"
+                )
+                self.assertIn(response.status_code, (400, 413))
+                self.assertEqual(
+                    list(RecipePicture.objects.values_list("id", flat=True)),
+                    [picture.id],
+                )
+                self.assertEqual(list(self.recipe.ingredients.all()), [salt])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username="cook", password="pw")
+        self.recipe = Recipe.objects.create(user=user, description="Toast")
+
+    def add_picture(self, content):
+        return RecipePicture.objects.create(
+            recipe=self.recipe, image=ContentFile(content, name="upload.jpg")
+        )
+
+    def test_identical_content_is_stored_once(self):
+        first = self.add_picture(b"same bytes")
+        second = self.add_picture(b"same bytes")
+        other = self.add_picture(b"other bytes")
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertRegex(
+            first.image.name, r"^recipe_images/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$"
+        )
+
+    def test_file_is_deleted_with_its_last_reference(self):
+        first = self.add_picture(b"same bytes")
+        second = self.add_picture(b"same bytes")
+        name = first.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(default_storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(default_storage.exists(name))
+
+    def test_reused_file_deleted_before_commit_is_written_back(self):
+        name = self.add_picture(b"same bytes").image.name
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.add_picture(b"same bytes")  # reuses the blob on disk
+        # a release whose reference check ran before that row was committed
+        picture_storage.delete(name)
+        for callback in callbacks:
+            callback()
+        with picture_storage.open(name) as restored:
+            self.assertEqual(restored.read(), b"same bytes")
+
+    def test_release_waits_for_the_blob_lock(self):
+        name = self.add_picture(b"same bytes").image.name
+        deleted = []
+        release = threading.Thread(
+            target=lambda: deleted.append(
+                picture_storage.delete_unreferenced(name, lambda: False)
+            )
+        )
+        with picture_storage.lock(name):
+            release.start()
+            release.join(0.2)
+            self.assertTrue(picture_storage.exists(name))
+        release.join()
+        self.assertEqual(deleted, [True])
+        self.assertFalse(picture_storage.exists(name))
+
+
+class IngredientResolutionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_recipe(self, names):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                "/recipes",
+                {"description": "Soup", "ingredients": [{"name": n} for n in names]},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+        return len(context.captured_queries)
+
+    def test_names_are_normalized_and_deduplicated(self):
+        Ingredient.objects.create(name="Salt")
+        self.create_recipe(["  salt ", "Black   Pepper", "black pepper"])
+        self.assertEqual(
+            sorted(Ingredient.objects.values_list("name", flat=True)),
+            ["Black Pepper", "Salt"],
+        )
+        self.assertEqual(Recipe.objects.get().ingredients.count(), 2)
+
+    def test_query_count_does_not_grow_with_ingredients(self):
+        few = self.create_recipe([f"new {i}" for i in range(3)])
+        many = self.create_recipe([f"other {i}" for i in range(30)])
+        self.assertEqual(few, many)
+
+    def test_duplicate_ingredient_is_rejected(self):
+        Ingredient.objects.create(name="Salt")
+        response = self.client.post("/ingredients", {"name": " SALT"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class IngredientSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        for name in ["Pepper", "Black Pepper", "Peppercorn", "Salt", "Red Pepper"]:
+            Ingredient.objects.create(name=name)
+        ingredient_index.rebuild()
+
+    def search(self, query, limit=10):
+        response = self.client.get("/ingredients/search", {"q": query, "limit": limit})
+        self.assertEqual(response.status_code, 200)
+        return [row["name"] for row in response.data]
+
+    def test_results_are_ranked_by_match_quality(self):
+        self.assertEqual(
+            self.search("pepper"),
+            ["Pepper", "Peppercorn", "Black Pepper", "Red Pepper"],
+        )
+        self.assertEqual(self.search("pepper", limit=2), ["Pepper", "Peppercorn"])
+        self.assertEqual(self.search("ercor"), ["Peppercorn"])
+        self.assertEqual(self.search("zzz"), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        Ingredient.objects.create(name="Pepperoni")
+        Ingredient.objects.get(name="Peppercorn").delete()
+        self.assertEqual(
+            self.search("pepper"),
+            ["Pepper", "Pepperoni", "Black Pepper", "Red Pepper"],
+        )
+
+    def test_names_created_with_a_recipe_are_searchable(self):
+        response = self.client.post(
+            "/recipes",
+            {"description": "Pizza", "ingredients": [{"name": "Pepperoni"}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIn("Pepperoni", self.search("pepper"))
+
+    def test_substring_tier_takes_the_first_names_alphabetically(self):
+        for name in ["Snapple", "Pineapple", "Apple"]:
+            Ingredient.objects.create(name=name)
+        self.assertEqual(self.search("ppl", limit=2), ["Apple", "Pineapple"])
+
+    @override_settings(INGREDIENT_INDEX_TTL=0)
+    def test_stale_index_is_rebuilt_without_blocking_searches(self):
+        started, release = threading.Event(), threading.Event()
+
+        class SlowIndex(IngredientIndex):
+            catalog = [(1, "Salt"), (2, "Sage")]
+
+            def rows(self):
+                started.set()
+                release.wait(5)
+                return self.catalog
+
+        index = SlowIndex()
+        index.rebuild([(1, "Salt")])
+        self.assertEqual(index.search("sa"), [(1, "Salt")])  # starts the rebuild
+        started.wait(5)
+        index.add(3, "Saffron")  # made while the rebuild runs
+        self.assertEqual(index.search("sa"), [(3, "Saffron"), (1, "Salt")])
+
+        release.set()
+        index._rebuild_thread.join()
+        with override_settings(INGREDIENT_INDEX_TTL=60):
+            self.assertEqual(
+                index.search("sa"), [(3, "Saffron"), (2, "Sage"), (1, "Salt")]
+            )
+
+
+class RecipeSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def add(self, description, summary=None):
+        return Recipe.objects.create(
+            user=self.user, description=description, summary=summary
+        )
+
+    def test_ranks_matches_and_returns_snippets(self):
+        curry = self.add("Chicken Curry", "A mild curry with coconut milk")
+        self.add("Pancakes", "Fluffy breakfast pancakes")
+        side = self.add("Rice", "Goes well with curry")
+
+        response = self.client.get("/recipes/search", {"q": "curr"})
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        self.assertEqual([r["id"] for r in results], [curry.id, side.id])
+        self.assertIn("<mark>", results[0]["snippet"])
+
+    def test_index_follows_updates_and_deletes(self):
+        recipe = self.add("Tomato Soup")
+        recipe.description = "Gazpacho"
+        recipe.save()
+        self.assertEqual(
+            self.client.get("/recipes/search?q=tomato").data["results"], []
+        )
+        self.assertEqual(
+            len(self.client.get("/recipes/search?q=gazpacho").data["results"]), 1
+        )
+        recipe.delete()
+        self.assertEqual(
+            self.client.get("/recipes/search?q=gazpacho").data["results"], []
+        )
+
+    def test_counter_updates_leave_the_index_alone(self):
+        recipe = self.add("Tomato Soup")
+        with connection.cursor() as db:
+            db.execute("SELECT total_changes()")
+            before = db.fetchone()[0]
+            Recipe.objects.filter(pk=recipe.pk).update(favorites_count=3)
+            db.execute("SELECT total_changes()")
+            self.assertEqual(db.fetchone()[0] - before, 1)  # no FTS rewrite
+
+    def test_pages_with_a_cursor(self):
+        for i in range(5):
+            self.add(f"Bread {i}")
+        ids, url = [], "/recipes/search?q=bread&page_size=2"
+        while url:
+            response = self.client.get(url)
+            ids.extend(r["id"] for r in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(sorted(ids), list(Recipe.objects.values_list("id", flat=True)))
+
+
+class PantryIndexTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.egg, self.flour, self.milk, self.salt = Ingredient.objects.resolve_names(
+            ["egg", "flour", "milk", "salt"]
+        )
+        pantry_index.rebuild()
+
+    def add(self, description, ingredients):
+        recipe = Recipe.objects.create(user=self.user, description=description)
+        recipe.ingredients.set(ingredients)
+        return recipe
+
+    def by_ingredients(self, *ingredients):
+        ids = ",".join(str(i.id) for i in ingredients)
+        response = self.client.get(f"/recipes/by-ingredients?ingredients={ids}")
+        self.assertEqual(response.status_code, 200)
+        return [(r["description"], r["matched"], r["missing"]) for r in response.data]
+
+    def test_ranks_by_coverage_then_missing(self):
+        self.add("Pancakes", [self.egg, self.flour, self.milk])
+        self.add("Boiled egg", [self.egg, self.salt])
+        self.add("Omelette", [self.egg])
+        self.add("Salted water", [self.salt])
+
+        self.assertEqual(
+            self.by_ingredients(self.egg, self.flour),
+            [("Omelette", 1, 0), ("Pancakes", 2, 1), ("Boiled egg", 1, 1)],
+        )
+
+    def test_index_follows_ingredient_changes(self):
+        recipe = self.add("Pancakes", [self.egg, self.flour])
+        self.assertEqual(self.by_ingredients(self.egg), [("Pancakes", 1, 1)])
+        recipe.ingredients.set([self.egg])
+        self.assertEqual(self.by_ingredients(self.egg), [("Pancakes", 1, 0)])
+        recipe.ingredients.clear()
+        self.assertEqual(self.by_ingredients(self.egg), [])
+        RecipeIngredient.objects.create(recipe=recipe, ingredient=self.milk)
+        self.assertEqual(self.by_ingredients(self.milk), [("Pancakes", 1, 0)])
+        recipe.delete()
+        self.assertEqual(self.by_ingredients(self.milk), [])
+
+    def test_matches_rebuilt_index(self):
+        index = PantryIndex()
+        index.rebuild([(1, 10), (1, 11), (2, 10), (3, 12)])
+        self.assertEqual(index.rank({10}), [(2, 1, 1), (1, 1, 2)])
+
+    @override_settings(PANTRY_INDEX_TTL=0)
+    def test_stale_index_is_rebuilt_without_blocking_ranking(self):
+        started, release = threading.Event(), threading.Event()
+
+        class SlowIndex(PantryIndex):
+            def rows(self):
+                started.set()
+                release.wait(5)
+                return [(1, 10), (2, 10), (2, 11)]
+
+        index = SlowIndex()
+        index.rebuild([(1, 10)])
+        self.assertEqual(index.rank({10}), [(1, 1, 1)])  # starts the rebuild
+        started.wait(5)
+        index.clear_recipe(1)  # made while the rebuild runs
+        self.assertEqual(index.rank({10}), [])
+
+        release.set()
+        index._rebuild_thread.join()
+        with override_settings(PANTRY_INDEX_TTL=60):
+            self.assertEqual(index.rank({10}), [(2, 1, 2)])
+
+
+class SimilarRecipeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create(self, description, names):
+        response = self.client.post(
+            "/recipes",
+            {"description": description, "ingredients": [{"name": n} for n in names]},
+            format="json",
+        )
+        return response.data["id"]
+
+    def test_similar_recipes_are_ranked_by_shared_ingredients(self):
+        base = ["egg", "flour", "milk", "butter", "sugar", "salt"]
+        pancakes = self.create("Pancakes", base)
+        crepes = self.create("Crepes", base[:5] + ["water"])
+        self.create("Waffles", base[:3] + ["oil", "yeast", "vanilla"])
+        self.create("Salad", ["lettuce", "tomato", "cucumber", "olive oil"])
+
+        response = self.client.get(f"/recipes/{pancakes}/similar")
+        self.assertEqual(response.status_code, 200)
+        names = [r["description"] for r in response.data]
+        self.assertEqual(names[0], "Crepes")
+        self.assertNotIn("Salad", names)
+        self.assertNotIn("Pancakes", names)
+
+        self.client.put(f"/recipes/{crepes}", {"ingredients": []}, format="json")
+        names = [
+            r["description"]
+            for r in self.client.get(f"/recipes/{pancakes}/similar").data
+        ]
+        self.assertNotIn("Crepes", names)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        caches["responses"].clear()
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.other = User.objects.create_user(username="other", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.salt = Ingredient.objects.create(name="Salt")
+        self.recipe = Recipe.objects.create(user=self.user, description="Soup")
+        self.recipe.ingredients.set([self.salt])
+
+    def get(self, url, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def test_unchanged_resource_answers_304_without_queries(self):
+        for url in [f"/recipes/{self.recipe.id}", "/recipes/my-recipes"]:
+            with self.subTest(url=url):
+                first = self.get(url)
+                self.assertEqual(first.status_code, 200)
+                with self.assertNumQueries(0):
+                    second = self.get(url, first["ETag"])
+                self.assertEqual(second.status_code, 304)
+                self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_related_writes_change_the_etag(self):
+        url = f"/recipes/{self.recipe.id}"
+        writes = [
+            lambda: Ingredient.objects.filter(pk=self.salt.pk).get().save(),
+            lambda: self.recipe.ingredients.clear(),
+            lambda: RecipePicture.objects.create(recipe=self.recipe, image="x.jpg"),
+            lambda: FavoriteRecipe.objects.create(user=self.other, recipe=self.recipe),
+            lambda: FavoriteRecipe.objects.filter(user=self.other).delete(),
+        ]
+        etag = self.get(url)["ETag"]
+        for write in writes:
+            write()
+            response = self.get(url, etag)
+            self.assertEqual(response.status_code, 200)
+            etag = response["ETag"]
+
+    def test_favoriting_another_users_recipe_expires_my_list(self):
+        theirs = Recipe.objects.create(user=self.other, description="Stew")
+        first = self.get("/recipes/my-recipes")
+        FavoriteRecipe.objects.create(user=self.user, recipe=theirs)
+        second = self.get("/recipes/my-recipes", first["ETag"])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(len(second.data["results"]), 2)
+
+    def test_etags_are_per_user(self):
+        FavoriteRecipe.objects.create(user=self.other, recipe=self.recipe)
+        mine = self.get("/recipes/my-recipes")
+        self.client.force_authenticate(user=self.other)
+        theirs = self.get("/recipes/my-recipes", mine["ETag"])
+        self.assertEqual(theirs.status_code, 200)
+        self.assertNotEqual(theirs["ETag"], mine["ETag"])
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        local_token_cache.clear()
+        caches["responses"].clear()
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_repeat_requests_skip_the_token_query(self):
+        etag = self.client.get("/recipes/my-recipes")["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get("/recipes/my-recipes", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_revoked_token_is_rejected(self):
+        self.assertEqual(self.client.get("/recipes").status_code, 200)
+        self.token.delete()
+        self.assertEqual(self.client.get("/recipes").status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.assertEqual(self.client.get("/recipes").status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get("/recipes").status_code, 401)
+
+    def test_each_request_gets_its_own_user(self):
+        authentication = CachedTokenAuthentication()
+        first, _ = authentication.authenticate_credentials(self.token.key)
+        first.first_name = "changed"
+        second, _ = authentication.authenticate_credentials(self.token.key)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.first_name, "")
+
+
+class FavoriteCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.recipes = [
+            Recipe.objects.create(user=self.user, description=f"Recipe {i}")
+            for i in range(3)
+        ]
+
+    def counts(self):
+        return [
+            Recipe.objects.get(pk=recipe.pk).favorites_count for recipe in self.recipes
+        ]
+
+    def test_toggle_keeps_count_in_step(self):
+        url = f"/recipes/{self.recipes[0].id}/favorite"
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["favorites_count"], 1)
+        self.assertEqual(self.client.post(url).status_code, 204)
+        self.assertEqual(self.counts(), [0, 0, 0])
+
+    def test_batch_is_idempotent(self):
+        payload = {"add": [r.id for r in self.recipes[:2]]}
+        for _ in range(2):
+            response = self.client.post(
+                "/recipes/favorites/batch", payload, format="json"
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.counts(), [1, 1, 0])
+        self.assertEqual(FavoriteRecipe.objects.count(), 2)
+
+        response = self.client.post(
+            "/recipes/favorites/batch",
+            {"add": [self.recipes[2].id], "remove": [self.recipes[0].id]},
+            format="json",
+        )
+        self.assertEqual(response.data["favorites"], [self.recipes[2].id])
+        self.assertEqual(self.counts(), [0, 1, 1])
+
+    def test_batch_rejects_unknown_recipes(self):
+        response = self.client.post(
+            "/recipes/favorites/batch", {"add": [999]}, format="json"
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(FavoriteRecipe.objects.exists())
+
+    def test_batch_rejects_malformed_bodies(self):
+        recipe_id = self.recipes[0].id
+        for payload in [[recipe_id], {"add": str(recipe_id)}, {"remove": recipe_id}]:
+            with self.subTest(payload=payload):
+                response = self.client.post(
+                    "/recipes/favorites/batch", payload, format="json"
+                )
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(FavoriteRecipe.objects.exists())
+
+
+class BulkRecipeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def bulk(self, items):
+        return self.client.post("/recipes/bulk", items, format="json")
+
+    def test_creates_and_updates_in_one_call(self):
+        salt = Ingredient.objects.create(name="Salt")
+        existing = Recipe.objects.create(user=self.user, description="Old")
+        response = self.bulk(
+            [
+                {"description": "Soup", "ingredients": [salt.id, {"name": "Leek"}]},
+                {"description": "Bread", "summary": "Crusty", "ingredients": ["flour"]},
+                {"id": existing.id, "description": "New", "ingredients": ["leek"]},
+            ]
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        self.assertEqual(
+            [r["status"] for r in results], ["created", "created", "updated"]
+        )
+        soup = Recipe.objects.get(pk=results[0]["id"])
+        self.assertEqual(
+            sorted(soup.ingredients.values_list("name", flat=True)), ["Leek", "Salt"]
+        )
+        existing.refresh_from_db()
+        self.assertEqual(existing.description, "New")
+        self.assertEqual(
+            list(existing.ingredients.values_list("name", flat=True)), ["Leek"]
+        )
+        self.assertEqual(Ingredient.objects.count(), 3)
+
+    def test_any_invalid_item_rejects_the_whole_batch(self):
+        other = User.objects.create_user(username="other", password="pw")
+        theirs = Recipe.objects.create(user=other, description="Theirs")
+        response = self.bulk(
+            [
+                {"description": "Fine", "ingredients": ["salt"]},
+                {"summary": "no description"},
+                {"id": theirs.id, "description": "Mine now"},
+                {"description": "Bad", "ingredients": [999]},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e["index"] for e in response.data["errors"]], [1])
+        self.assertEqual(Recipe.objects.count(), 1)
+
+        response = self.bulk(
+            [
+                {"id": theirs.id, "description": "x"},
+                {"description": "y", "ingredients": [999]},
+            ]
+        )
+        self.assertEqual([e["index"] for e in response.data["errors"]], [0, 1])
+
+    def test_repeated_ids_are_rejected(self):
+        mine = Recipe.objects.create(user=self.user, description="Mine")
+        response = self.bulk(
+            [
+                {"id": mine.id, "ingredients": ["salt"]},
+                {"id": mine.id, "ingredients": ["salt"]},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e["index"] for e in response.data["errors"]], [1])
+        self.assertFalse(RecipeIngredient.objects.exists())
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def count(size, offset):
+            items = [
+                {"description": f"R{i}", "ingredients": [f"i{i}", "salt"]}
+                for i in range(offset, offset + size)
+            ]
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.bulk(items).status_code, 200)
+            return len(context.captured_queries)
+
+        # only SQLite's per-statement parameter limit splits the inserts
+        self.assertLess(count(50, 100), 30)
+        self.assertLess(count(200, 300), 40)
+
+
+class RecipeNDJSONTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.path = tempfile.mktemp(suffix=".ndjson")
+
+    def export(self, **options):
+        call_command("export_recipes", self.path, stderr=StringIO(), **options)
+
+    def import_(self, **options):
+        call_command("import_recipes", self.path, stdout=StringIO(), **options)
+
+    def test_round_trip(self):
+        make_recipes(self.user, 5)
+        self.export(batch_size=2)
+        with open(self.path, encoding="utf-8") as lines:
+            records = [json.loads(line) for line in lines]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0]["user"], "cook")
+        self.assertEqual(
+            records[0]["ingredients"], [f"ingredient {i}" for i in range(3)]
+        )
+        self.assertEqual(records[0]["pictures"][0]["image"], "recipe_images/x.jpg")
+
+        Recipe.objects.all().delete()
+        self.import_(batch_size=2)
+        self.assertEqual(Recipe.objects.count(), 5)
+        self.assertEqual(Ingredient.objects.count(), 3)
+        recipe = Recipe.objects.order_by("id").first()
+        self.assertEqual(recipe.user, self.user)
+        self.assertEqual(recipe.ingredients.count(), 3)
+        self.assertEqual(recipe.pictures.get().image.name, "recipe_images/x.jpg")
+
+    def test_unknown_users_and_bad_lines(self):
+        with open(self.path, "w", encoding="utf-8") as out:
+            out.write(json.dumps({"user": "new", "description": "Soup"}) + "\n\n")
+            out.write("not json\n")
+        with self.assertRaisesMessage(CommandError, "Line 1: unknown user 'new'"):
+            self.import_(batch_size=1)
+        with self.assertRaisesMessage(CommandError, "Line 3: invalid JSON"):
+            self.import_(create_users=True, batch_size=1)
+        # the batch before the bad line was committed
+        self.assertEqual(Recipe.objects.get().user.username, "new")
+
+    def test_user_option_overrides_the_owner(self):
+        with open(self.path, "w", encoding="utf-8") as out:
+            out.write(json.dumps({"user": "nobody", "description": "Soup"}) + "\n")
+        self.import_(user="cook")
+        self.assertEqual(Recipe.objects.get().user, self.user)
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class SyntheticCatalogTests(TestCase):
+    def generate(self):
+        generate_catalog(users=5, recipes=40, ingredients=60, favorites=50, seed=7)
+
+    def test_same_seed_same_catalog(self):
+        self.generate()
+        counts = (Recipe.objects.count(), FavoriteRecipe.objects.count())
+        recipes = list(
+            Recipe.objects.order_by("id").values_list(
+                "user__username", "description", "summary"
+            )
+        )
+        self.assertEqual(counts, (40, 50))
+        self.assertTrue(RecipeIngredient.objects.exists())
+        self.assertTrue(RecipePicture.objects.exists())
+        self.assertEqual(
+            sum(Recipe.objects.values_list("favorites_count", flat=True)), 50
+        )
+
+        Recipe.objects.all().delete()
+        self.generate()
+        self.assertEqual(
+            list(
+                Recipe.objects.order_by("id").values_list(
+                    "user__username", "description", "summary"
+                )
+            ),
+            recipes,
+        )
+
+    def test_benchmark_drives_every_route(self):
+        self.generate()
+        context = BenchmarkContext.for_busiest_user("synthetic", random.Random(1))
+        results = run_benchmark(
+            ROUTES, context, requests=2, warmup=0, host="testserver"
+        )
+        self.assertEqual(set(results), {route.name for route in ROUTES})
+        for name, stats in results.items():
+            self.assertEqual(stats["errors"], 0, name)
+            self.assertEqual(stats["requests"], 2)
+            self.assertIsNotNone(stats["queries_per_request"])
+
+        slower = {
+            name: {**stats, "p95_ms": stats["p95_ms"] * 2}
+            for name, stats in results.items()
+        }
+        self.assertEqual(compare(results, results), [])
+        self.assertEqual(len(compare(slower, results)), len(results))
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        metrics_registry.reset()
+
+    def test_server_timing_header(self):
+        make_recipes(self.user, 3)
+        response = self.client.get("/recipes")
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn("serialize;dur=", timing)
+
+    @override_settings(METRICS_TOKEN="scrape-me")
+    def test_metrics_endpoint_has_per_view_histograms(self):
+        self.client.get("/recipes")
+        self.client.get("/recipes")
+        self.client.get("/ingredients/search?q=x")
+        response = self.client.get(
+            "/metrics", headers={"Authorization": "Bearer scrape-me"}
+        )
+        body = response.content.decode()
+        self.assertIn(
+            'recipeapi_request_duration_seconds_count{view="recipe-list",method="GET"} 2',
+            body,
+        )
+        self.assertIn(
+            'recipeapi_request_db_queries_bucket{view="ingredient-search",'
+            'method="GET",le="+Inf"} 1',
+            body,
+        )
+        self.assertIn(
+            'recipeapi_responses_total{view="recipe-list",method="GET",status="200"} 2',
+            body,
+        )
+
+    @override_settings(METRICS_TOKEN="scrape-me")
+    def test_metrics_endpoint_needs_staff_or_the_token(self):
+        for headers in [{}, {"Authorization": "Bearer wrong"}]:
+            with self.subTest(headers=headers):
+                response = self.client.get("/metrics", headers=headers)
+                self.assertEqual(response.status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    @override_settings(METRICS_LOG_SLOW_QUERIES=True, METRICS_SLOW_QUERY_MS=0)
+    def test_slow_queries_are_logged_with_stack(self):
+        with self.assertLogs("recipeapi.metrics", "WARNING") as logs:
+            self.client.get("/recipes")
+        self.assertIn("Slow query", logs.output[0])
+        self.assertIn("recipe_view.py", "\n".join(logs.output))
+
+
+class RequestProfilingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.directory = tempfile.mkdtemp()
+        profiling = self.settings(
+            PROFILING_ENABLED=True,
+            PROFILING_DIR=self.directory,
+            PROFILING_MAX_FILES=2,
+            PROFILING_SAMPLE_INTERVAL=0.0001,
+        )
+        profiling.enable()
+        self.addCleanup(profiling.disable)
+        # a fresh client, so its handler loads the now-enabled middleware
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        make_recipes(self.user, 3)
+
+    def test_disabled_middleware_is_not_loaded(self):
+        with self.settings(PROFILING_ENABLED=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                RequestProfilingMiddleware(lambda request: None)
+
+    def test_signed_header_writes_a_tagged_profile(self):
+        response = self.client.get("/recipes", HTTP_X_PROFILE=make_token("cprofile"))
+        name = response["X-Profile-File"]
+        self.assertRegex(name, r"-GET-recipe-list-q\d+-\d+ms\.prof$")
+        stats = pstats.Stats(os.path.join(self.directory, name))
+        self.assertTrue(stats.total_calls)
+
+    def test_sampling_profiler_writes_collapsed_stacks(self):
+        response = self.client.get("/recipes", HTTP_X_PROFILE=make_token("sampling"))
+        self.assertTrue(response["X-Profile-File"].endswith(".collapsed"))
+        with open(os.path.join(self.directory, response["X-Profile-File"])) as f:
+            for line in f:
+                self.assertRegex(line, r"^\S.*;.* \d+$")
+
+    async def test_async_requests_are_profiled_without_a_thread_hop(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(RequestProfilingMiddleware(get_response)))
+        token = await sync_to_async(Token.objects.create)(user=self.user)
+        response = await AsyncClient().get(
+            "/recipes",
+            headers={"Authorization": f"Token {token.key}", "X-Profile": make_token()},
+        )
+        self.assertRegex(response["X-Profile-File"], r"-GET-recipe-list-q[1-9]\d*-")
+
+    def test_unsigned_requests_are_not_profiled_and_files_rotate(self):
+        response = self.client.get("/recipes", HTTP_X_PROFILE="cprofile:forged")
+        self.assertNotIn("X-Profile-File", response)
+        self.assertEqual(os.listdir(self.directory), [])
+
+        for _ in range(3):
+            self.client.get("/recipes", HTTP_X_PROFILE=make_token())
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    databases = {"default"}
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "locks.sqlite3")
+        self.holder = sqlite3.connect(
+            self.path, isolation_level=None, check_same_thread=False
+        )
+        self.holder.execute("CREATE TABLE t (x INTEGER)")
+        self.addCleanup(self.holder.close)
+        waiter = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        self.addCleanup(waiter.close)
+        self.cursor = waiter.cursor(factory=RetryingCursorWrapper)
+        self.cursor.retries, self.cursor.delay = 6, 0.02
+
+    def test_pragmas_are_applied_to_each_connection(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_transactions_take_the_write_lock_up_front(self):
+        with CaptureQueriesContext(connection) as context:
+            with transaction.atomic():
+                connection.cursor().execute("SELECT 1")
+        self.assertEqual(context.captured_queries[0]["sql"], "BEGIN IMMEDIATE")
+
+    def test_locked_statement_is_retried_until_the_lock_is_released(self):
+        self.holder.execute("BEGIN IMMEDIATE")
+        threading.Timer(0.1, self.holder.execute, ["COMMIT"]).start()
+        self.cursor.execute("INSERT INTO t VALUES (1)")
+        self.assertEqual(self.cursor.execute("SELECT x FROM t").fetchall(), [(1,)])
+
+    def test_statements_inside_a_transaction_are_not_retried(self):
+        self.cursor.execute("BEGIN")
+        self.cursor.execute("SELECT * FROM t")
+        self.holder.execute("BEGIN IMMEDIATE")
+        self.addCleanup(self.holder.execute, "COMMIT")
+        self.addCleanup(self.cursor.execute, "ROLLBACK")  # runs first
+        started = time.monotonic()
+        with self.assertRaisesMessage(sqlite3.OperationalError, "database is locked"):
+            self.cursor.execute("INSERT INTO t VALUES (1)")
+        self.assertLess(time.monotonic() - started, 0.02)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Reads against a second SQLite file that only changes on `sync()`"""
+
+    databases = {"default"}
+
+    def setUp(self):
+        # registered on this thread only, outside settings.DATABASES, so the
+        # test runner neither creates nor flushes it
+        self.replica_path = os.path.join(tempfile.mkdtemp(), "replica.sqlite3")
+        replica = connections.configure_settings(
+            {
+                "default": connections.settings["default"],
+                "replica": {
+                    "ENGINE": "recipeapi.sqlite_backend",
+                    "NAME": self.replica_path,
+                },
+            }
+        )["replica"]
+        backend = load_backend(replica["ENGINE"])
+        connections["replica"] = backend.DatabaseWrapper(replica, "replica")
+        self.addCleanup(self.remove_replica)
+        caches["default"].clear()
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.soup = Recipe.objects.create(user=self.user, description="Soup")
+        self.sync()
+
+    def remove_replica(self):
+        connections["replica"].close()
+        del connections["replica"]
+
+    def sync(self):
+        """Copy the primary onto the replica, as replication eventually would"""
+        connections["replica"].close()
+        connection.ensure_connection()
+        target = sqlite3.connect(self.replica_path)
+        try:
+            connection.connection.backup(target)
+        finally:
+            target.close()
+
+    def listed(self, url="/recipes"):
+        return [recipe["id"] for recipe in self.client.get(url).data["results"]]
+
+    def test_reads_are_served_by_the_replica(self):
+        stew = Recipe.objects.create(user=self.user, description="Stew")
+        salt = Ingredient.objects.create(name="Salt")
+        self.assertEqual(self.listed(), [self.soup.id])
+        self.assertEqual(self.listed("/recipes/my-recipes"), [self.soup.id])
+        self.assertEqual(self.client.get(f"/recipes/{stew.id}").status_code, 404)
+        self.assertEqual(self.client.get(f"/ingredients/{salt.id}").status_code, 404)
+
+        self.sync()
+        self.assertEqual(self.listed(), [self.soup.id, stew.id])
+        response = self.client.get(f"/recipes/{stew.id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)  # replica reads skip the response cache
+
+    def test_writes_go_to_the_primary_and_pin_the_writer(self):
+        response = self.client.post(
+            "/recipes",
+            {"description": "Stew", "ingredients": [{"name": "salt"}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        stew = response.data["id"]
+        self.assertFalse(Recipe.objects.using("replica").filter(pk=stew).exists())
+
+        # the writer reads their own write from the primary...
+        self.assertEqual(self.listed(), [self.soup.id, stew])
+        self.assertEqual(self.client.get(f"/recipes/{stew}").status_code, 200)
+        # ...while everyone else keeps reading the replica
+        other = User.objects.create_user(username="other", password="pw")
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.listed(), [self.soup.id])
+
+        self.client.force_authenticate(user=self.user)
+        caches["default"].delete(pin_key(self.user.id))  # the window expires
+        self.assertEqual(self.listed(), [self.soup.id])
+
+    def test_failed_writes_do_not_pin(self):
+        response = self.client.put("/recipes/0", {"description": "x"}, format="json")
+        self.assertGreaterEqual(response.status_code, 400)
+        Recipe.objects.create(user=self.user, description="Stew")
+        self.assertEqual(self.listed(), [self.soup.id])
+
+
+class AsyncViewTests(TestCase):
+    """AsyncClient goes through Django's ASGI handler, so ASYNC_URLCONF applies"""
+
+    def setUp(self):
+        caches["responses"].clear()
+        self.user = User.objects.create_user(username="cook", password="pw")
+        token = Token.objects.create(user=self.user).key
+        self.auth = {"Authorization": f"Token {token}"}
+        self.async_client = AsyncClient()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        make_recipes(self.user, 3)
+        self.recipe = Recipe.objects.first()
+        self.ingredient = Ingredient.objects.first()
+
+    async def test_get_routes_match_the_sync_views(self):
+        for url in [
+            "/recipes",
+            f"/recipes/{self.recipe.id}",
+            "/recipes/my-recipes",
+            "/recipes/favorites",
+            "/ingredients?page_size=2",
+            f"/ingredients/{self.ingredient.id}",
+            "/ingredients/0",
+        ]:
+            with self.subTest(url=url):
+                response = await self.async_client.get(url, headers=self.auth)
+                self.assertTrue(
+                    issubclass(response.resolver_match.func.view_class, AsyncAPIView)
+                )
+                expected = await sync_to_async(self.client.get)(url)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.json(), expected.json())
+
+    async def test_requests_need_a_valid_token(self):
+        for headers in [{}, {"Authorization": "Token nope"}]:
+            with self.subTest(headers=headers):
+                response = await self.async_client.get("/recipes", headers=headers)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response["WWW-Authenticate"], "Token")
+
+    async def test_retrieve_is_response_cached(self):
+        url = f"/recipes/{self.recipe.id}"
+        first = await self.async_client.get(url, headers=self.auth)
+        second = await self.async_client.get(
+            url, headers={**self.auth, "If-None-Match": first["ETag"]}
+        )
+        self.assertEqual(second.status_code, 304)
+
+    async def test_queries_on_the_orm_thread_are_timed(self):
+        response = await self.async_client.get("/recipes", headers=self.auth)
+        self.assertRegex(
+            response["Server-Timing"], r'db;dur=[\d.]+;desc="[1-9]\d* queries"'
+        )
+
+    async def test_writes_fall_through_to_the_sync_views(self):
+        response = await self.async_client.post(
+            "/recipes",
+            {"description": "Stew", "ingredients": [{"name": "salt"}]},
+            content_type="application/json",
+            headers=self.auth,
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await Recipe.objects.filter(description="Stew").aexists())
+
+    async def test_token_writes_pass_csrf_checks(self):
+        client = AsyncClient(enforce_csrf_checks=True)
+        response = await client.post(
+            "/recipes",
+            {"description": "Soup", "ingredients": [{"name": "salt"}]},
+            content_type="application/json",
+            headers=self.auth,
+        )
+        self.assertEqual(response.status_code, 201)
+        response = await client.delete(f"/recipes/{self.recipe.id}", headers=self.auth)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(await Recipe.objects.filter(pk=self.recipe.id).aexists())
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        make_recipes(self.user, 3)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries.captured_queries)
+
+    def test_fields_limit_the_payload_and_the_prefetches(self):
+        full, full_queries = self.get("/recipes")
+        self.assertNotIn("primary_picture", full.data["results"][0])
+        sparse, sparse_queries = self.get(
+            "/recipes?fields=id,description,primary_picture"
+        )
+        row = sparse.data["results"][0]
+        self.assertEqual(set(row), {"id", "description", "primary_picture"})
+        self.assertEqual(
+            row["primary_picture"], "http://testserver/media/recipe_images/x.jpg"
+        )
+        self.assertEqual(sparse_queries, full_queries - 2)  # no ingredients, favorites
+
+    def test_relations_are_ids_unless_expanded(self):
+        recipe = Recipe.objects.first()
+        ingredient_ids = sorted(recipe.ingredients.values_list("id", flat=True))
+        for url in ["/recipes", "/recipes/my-recipes", f"/recipes/{recipe.id}"]:
+            with self.subTest(url=url):
+                response, _ = self.get(f"{url}?fields=id,ingredients")
+                row = (
+                    response.data["results"][0]
+                    if "results" in response.data
+                    else response.data
+                )
+                self.assertEqual(sorted(row["ingredients"]), ingredient_ids)
+                response, _ = self.get(
+                    f"{url}?fields=id,ingredients&expand=ingredients"
+                )
+                row = (
+                    response.data["results"][0]
+                    if "results" in response.data
+                    else response.data
+                )
+                self.assertEqual(
+                    sorted(i["id"] for i in row["ingredients"]), ingredient_ids
+                )
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get("/recipes?fields=id,secret")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {"fields": ["Unknown field: secret"]})
+
+    def test_orjson_renders_the_same_bytes(self):
+        Recipe.objects.create(
+            user=self.user, description='Crème brûlée\u2028à la "maison"'
+        )
+        data = self.client.get("/recipes").data
+        fast = ORJSONRenderer().render(data, "application/json")
+        self.assertEqual(fast, JSONRenderer().render(data, "application/json"))
+        with override_settings(ORJSON_RENDERING=False):
+            self.assertEqual(ORJSONRenderer().render(data, "application/json"), fast)
+
+    def test_benchmark_command_reports_each_combination(self):
+        out = StringIO()
+        call_command(
+            "benchmark_rendering", recipes=5, repeat=1, host="testserver", stdout=out
+        )
+        rows = [line.split()[:2] for line in out.getvalue().splitlines()[1:]]
+        self.assertEqual(
+            rows,
+            [
+                ["full", "stdlib"],
+                ["full", "orjson"],
+                ["sparse", "stdlib"],
+                ["sparse", "orjson"],
+            ],
+        )
+        self.assertEqual(Recipe.objects.count(), 3)  # rolled back
+
+
+class QueryPlanTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cook", password="pw")
+        self.other = User.objects.create_user(username="other", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        make_recipes(self.user, 3)  # each also favorited by its owner
+        make_recipes(self.other, 3)
+        self.theirs = Recipe.objects.filter(user=self.other).first()
+        FavoriteRecipe.objects.create(user=self.user, recipe=self.theirs)
+
+    def plans(self, url):
+        """(sql, EXPLAIN QUERY PLAN steps) of each query `url` runs"""
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with connection.cursor() as cursor:
+            for query in captured.captured_queries:
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                yield query["sql"], [row[3] for row in cursor.fetchall()]
+
+    def test_my_recipes_is_owned_plus_favorited_without_duplicates(self):
+        response = self.client.get("/recipes/my-recipes")
+        ids = [row["id"] for row in response.data["results"]]
+        expected = list(
+            Recipe.objects.filter(user=self.user).values_list("id", flat=True)
+        )
+        self.assertEqual(ids, sorted(expected + [self.theirs.id]))
+
+    def test_per_user_reads_never_scan_a_table(self):
+        recipe = Recipe.objects.filter(user=self.user).first()
+        for url in [
+            "/recipes/my-recipes",
+            "/recipes/favorites",
+            f"/recipes/{recipe.id}",
+        ]:
+            for sql, plan in self.plans(url):
+                with self.subTest(url=url, sql=sql):
+                    self.assertEqual(
+                        [step for step in plan if step.startswith("SCAN ")], []
+                    )
+
+    def test_join_tables_have_unique_composite_indexes(self):
+        with connection.cursor() as cursor:
+            for table, columns in [
+                ("recipeapi_favoriterecipe", ["user_id", "recipe_id"]),
+                ("recipeapi_recipeingredient", ["recipe_id", "ingredient_id"]),
+            ]:
+                constraints = connection.introspection.get_constraints(cursor, table)
+                self.assertIn(
+                    columns,
+                    [c["columns"] for c in constraints.values() if c["unique"]],
+                )
+        link = RecipeIngredient.objects.first()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            RecipeIngredient.objects.create(
+                recipe_id=link.recipe_id, ingredient_id=link.ingredient_id
+            )
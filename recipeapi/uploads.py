@@ -0,0 +1,65 @@
+import base64
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+
+# base64 is decoded a slice at a time; the slice length must be a multiple of 4
+BASE64_CHUNK_CHARS = 4 * 16 * 1024
+
+
+def max_upload_bytes():
+    return getattr(settings, "IMAGE_UPLOAD_MAX_BYTES", 10 * 1024 * 1024)
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class SizeLimitedUploadHandler(FileUploadHandler):
+    """Skip any uploaded file once it grows past IMAGE_UPLOAD_MAX_BYTES.
+
+    Installed ahead of Django's own handlers, it sees every chunk as it comes
+    off the socket, so an oversized file is rejected without being stored.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = max_upload_bytes()
+        self.exceeded = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_bytes:
+            self.exceeded = True
+            raise SkipFile()
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+def decode_data_url(data_url, name):
+    """Decode a base64 data URL into a spooled temporary file.
+
+    Returns a File named `name` plus the data URL's extension. The string is
+    decoded in fixed-size slices, so only one slice of decoded bytes is held
+    in memory at a time and large images spill to disk past
+    FILE_UPLOAD_MAX_MEMORY_SIZE.
+    """
+    marker = ";base64,"
+    start = data_url.index(marker)
+    ext = data_url[:start].split("/")[-1]
+    start += len(marker)
+
+    max_bytes = max_upload_bytes()
+    if (len(data_url) - start) * 3 // 4 > max_bytes + 2:
+        raise UploadTooLarge(f"Images are limited to {max_bytes} bytes")
+
+    spooled = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    for offset in range(start, len(data_url), BASE64_CHUNK_CHARS):
+        spooled.write(base64.b64decode(data_url[offset : offset + BASE64_CHUNK_CHARS]))
+    spooled.seek(0)
+    return File(spooled, name=f"{name}.{ext}")
@@ -1,3 +1,5 @@
 from .users import UserViewSet
 from .recipe_view import RecipeView
 from .ingredient_view import IngredientView
+from .picture_variant_view import picture_variant
+from .metrics_view import metrics
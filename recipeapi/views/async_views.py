@@ -0,0 +1,145 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.urls import resolve
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from recipeapi.authentication import CachedTokenAuthentication
+from recipeapi.db_router import ais_pinned, replica_reads
+from recipeapi.models import Ingredient, Recipe
+from recipeapi.pagination import IdCursorPagination
+from recipeapi.response_cache import cache_response, my_recipes_scope, recipe_scope
+from recipeapi.sparse_fields import requested_fields
+from .ingredient_view import IngredientSerializer
+from .recipe_view import RecipeSerializer, favorite_recipes, my_recipes
+
+
+class AsyncAPIView(View):
+    """Base for the async read endpoints served by recipeproject.asgi_urls.
+
+    DRF only runs sync handlers, so this does the part of its request cycle
+    these endpoints need: token authentication, the IsAuthenticated check,
+    replica routing (as ReplicaReadsMixin does), API errors and rendering. Like a
+    ViewSet route, `action` names the handler a GET runs; other methods on
+    the same URL are handed to the sync view in ROOT_URLCONF. Queries go
+    through Django's async ORM, so a slow request holds no thread while it
+    waits.
+    """
+
+    action = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # as APIView.as_view does: CSRF only matters for session auth, which
+        # these views do not use, and writes fall through to DRF views that
+        # are exempt too
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            match = resolve(request.path_info, urlconf=settings.ROOT_URLCONF)
+            return await sync_to_async(match.func)(request, *match.args, **match.kwargs)
+
+        request = Request(request, authenticators=[CachedTokenAuthentication()])
+        try:
+            # a token missing from the auth cache is looked up in the database
+            user = await sync_to_async(lambda: request.user)()
+            if not user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+        except exceptions.APIException as exc:
+            exc.auth_header = "Token"
+            return self.render(request, self.handle_exception(request, exc))
+
+        with replica_reads(not await ais_pinned(user)):
+            try:
+                response = await super().dispatch(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                response = self.handle_exception(request, exc)
+        return self.render(request, response)
+
+    async def get(self, request, *args, **kwargs):
+        return await getattr(self, self.action)(request, *args, **kwargs)
+
+    def handle_exception(self, request, exc):
+        # sets WWW-Authenticate from exc.auth_header, as APIView does
+        return exception_handler(exc, {"view": self, "request": request})
+
+    def render(self, request, response):
+        if isinstance(response, Response):
+            response.accepted_renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+            response.accepted_media_type = "application/json"
+            response.renderer_context = {
+                "request": request,
+                "response": response,
+                "view": self,
+            }
+            response.render()
+        return response
+
+    async def paginated_response(self, request, queryset, serializer_class):
+        """Serialize one cursor page, like the sync views' IdCursorPagination"""
+        paginator = IdCursorPagination()
+        # the paginator has no async API; run it where the async ORM runs
+        # its queries, on the thread-sensitive executor
+        page = await sync_to_async(paginator.paginate_queryset)(
+            queryset, request, view=self
+        )
+        serialized = serializer_class(page, many=True, context={"request": request})
+        return paginator.get_paginated_response(serialized.data)
+
+
+class AsyncRecipeView(AsyncAPIView):
+    """The GET routes of RecipeView"""
+
+    async def list(self, request):
+        recipes = Recipe.objects.with_details(request.user, requested_fields(request))
+        return await self.paginated_response(request, recipes, RecipeSerializer)
+
+    @cache_response(lambda request, pk=None: recipe_scope(pk))
+    async def retrieve(self, request, pk=None):
+        try:
+            recipes = Recipe.objects.with_details(
+                request.user, requested_fields(request)
+            )
+            recipe = await recipes.aget(pk=pk)
+        except Recipe.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        if recipe.user_id != request.user.id:
+            return Response(
+                {"detail": "You do not have permission to view this recipe."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        serialized = RecipeSerializer(recipe, context={"request": request})
+        return Response(serialized.data, status=status.HTTP_200_OK)
+
+    @cache_response(lambda request: my_recipes_scope(request.user.id))
+    async def list_my_recipes(self, request):
+        recipes = my_recipes(request.user, requested_fields(request))
+        return await self.paginated_response(request, recipes, RecipeSerializer)
+
+    async def list_favorites(self, request):
+        recipes = favorite_recipes(request.user, requested_fields(request))
+        return await self.paginated_response(request, recipes, RecipeSerializer)
+
+
+class AsyncIngredientView(AsyncAPIView):
+    """The GET routes of IngredientView, except the in-memory search"""
+
+    async def list(self, request):
+        ingredients = Ingredient.objects.all()
+        return await self.paginated_response(request, ingredients, IngredientSerializer)
+
+    async def retrieve(self, request, pk=None):
+        try:
+            ingredient = await Ingredient.objects.aget(pk=pk)
+        except Ingredient.DoesNotExist:
+            return Response(
+                {"error": "Ingredient not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        serialized = IngredientSerializer(ingredient, many=False)
+        return Response(serialized.data, status=status.HTTP_200_OK)
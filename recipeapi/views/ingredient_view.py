@@ -1,19 +1,48 @@
 from rest_framework import serializers, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from recipeapi.models.ingredient import Ingredient
+from recipeapi.db_router import ReplicaReadsMixin
+from recipeapi.models.ingredient import Ingredient, normalize_name
+from recipeapi.ingredient_index import ingredient_index
+from recipeapi.metrics import TimedSerializerMixin
+from recipeapi.pagination import IdCursorPagination
 
 
 # Serializer for Ingredient
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = ["id", "name"]
 
+    def validate_name(self, value):
+        duplicates = Ingredient.objects.filter(normalized_name=normalize_name(value))
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise serializers.ValidationError("An ingredient with this name exists.")
+        return value
+
 
 # ViewSet for Ingredient
-class IngredientView(viewsets.ViewSet):
+class IngredientView(ReplicaReadsMixin, viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
+    replica_actions = ("list", "retrieve")  # search answers from memory
+
+    @action(detail=False, methods=["get"], url_path="search")
+    def search(self, request):
+        """Type-ahead: ingredients ranked by how well their name matches ?q="""
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 10)), 50))
+        except ValueError:
+            return Response(
+                {"error": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        matches = ingredient_index.search(request.query_params.get("q", ""), limit)
+        return Response(
+            [{"id": pk, "name": name} for pk, name in matches],
+            status=status.HTTP_200_OK,
+        )
 
     def retrieve(self, request, pk=None):
         try:
@@ -27,8 +56,10 @@ class IngredientView(viewsets.ViewSet):
 
     def list(self, request):
         ingredients = Ingredient.objects.all()
-        serialized = IngredientSerializer(ingredients, many=True)
-        return Response(serialized.data, status=status.HTTP_200_OK)
+        paginator = IdCursorPagination()
+        page = paginator.paginate_queryset(ingredients, request, view=self)
+        serialized = IngredientSerializer(page, many=True)
+        return paginator.get_paginated_response(serialized.data)
 
     def create(self, request):
         serializer = IngredientSerializer(data=request.data)
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+from recipeapi.metrics import registry
+
+
+def may_read_metrics(request):
+    """Staff users, or a scraper sending `Authorization: Bearer <METRICS_TOKEN>`"""
+    if request.user.is_staff:
+        return True
+    token = getattr(settings, "METRICS_TOKEN", None)
+    header = request.headers.get("Authorization", "")
+    return bool(token) and constant_time_compare(header, f"Bearer {token}")
+
+
+@require_GET
+def metrics(request):
+    """Request histograms of this process in the Prometheus text format"""
+    if not may_read_metrics(request):
+        return HttpResponseForbidden("Metrics need a staff login or METRICS_TOKEN")
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
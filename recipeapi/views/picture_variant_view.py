@@ -0,0 +1,37 @@
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from recipeapi.image_variants import (
+    VARIANT_FORMATS,
+    VARIANT_WIDTHS,
+    UnreadableImage,
+    get_or_create_variant,
+)
+from recipeapi.models.recipe_picture import RecipePicture
+
+CONTENT_TYPES = {"webp": "image/webp", "jpg": "image/jpeg"}
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])  # same visibility as the originals under /media
+def picture_variant(request, pk, width, fmt):
+    """Serve a resized copy of a recipe picture, generating it the first time"""
+    if width not in VARIANT_WIDTHS or fmt not in VARIANT_FORMATS:
+        raise Http404("Unknown picture variant")
+    try:
+        picture = RecipePicture.objects.get(pk=pk, status=RecipePicture.READY)
+    except RecipePicture.DoesNotExist as e:
+        raise Http404("Picture not found") from e
+    if not picture.image:
+        raise Http404("Picture not found")
+
+    try:
+        name = get_or_create_variant(picture, width, fmt)
+    except UnreadableImage as e:
+        raise Http404("Picture not found") from e
+    response = FileResponse(
+        default_storage.open(name, "rb"), content_type=CONTENT_TYPES[fmt]
+    )
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
@@ -1,7 +1,8 @@
-import requests
 import uuid
-import base64
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.uploadhandler import SkipFile
+from django.db import transaction
+from django.urls import reverse
 from rest_framework import serializers, status, viewsets
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
@@ -10,30 +11,69 @@ from recipeapi.models.recipe import Recipe
 from recipeapi.models.ingredient import Ingredient  # Import the Ingredient model
 from recipeapi.models.recipe_picture import RecipePicture
 from recipeapi.models.favorite_recipe import FavoriteRecipe
+from recipeapi.db_router import ReplicaReadsMixin
+from recipeapi.image_jobs import enqueue_images
+from recipeapi.image_variants import VARIANT_FORMATS, VARIANT_WIDTHS
+from recipeapi.metrics import TimedSerializerMixin
+from recipeapi.pagination import IdCursorPagination
+from recipeapi.recipe_bulk import validate_items, write_items
+from recipeapi.pantry_index import pantry_index
+from recipeapi.recipe_search import InvalidCursor, search_recipes
+from recipeapi.response_cache import (
+    cache_response,
+    invalidate_recipes,
+    my_recipes_scope,
+    recipe_scope,
+)
+from recipeapi.similarity import refresh_signatures, similar_recipes
+from recipeapi.sparse_fields import SparseFieldsMixin, requested_fields
+from recipeapi.uploads import SizeLimitedUploadHandler, UploadTooLarge, decode_data_url
 from .ingredient_view import IngredientSerializer
 from rest_framework.decorators import action
+from rest_framework.parsers import FileUploadParser, MultiPartParser
+from rest_framework.utils.urls import replace_query_param
 
 
-class FavoriteRecipeSerializer(serializers.ModelSerializer):
+class FavoriteRecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = FavoriteRecipe
         fields = ("id", "user", "recipe")
 
 
-class RecipePictureSerializer(serializers.ModelSerializer):
+class RecipePictureSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     image = serializers.ImageField(use_url=True)
+    variants = serializers.SerializerMethodField()
 
     class Meta:
         model = RecipePicture
-        fields = ["id", "image", "is_primary"]
+        fields = ["id", "image", "is_primary", "status", "variants"]
 
-
-class RecipeSerializer(serializers.ModelSerializer):
+    def get_variants(self, obj):
+        """URLs of the resized copies, e.g. variants["480"]["webp"]"""
+        if obj.status != RecipePicture.READY or not obj.image:
+            return {}
+        request = self.context.get("request", None)
+        variants = {}
+        for width in VARIANT_WIDTHS:
+            variants[str(width)] = {}
+            for fmt in VARIANT_FORMATS:
+                url = reverse("picture-variant", args=[obj.id, width, fmt])
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                variants[str(width)][fmt] = url
+        return variants
+
+
+class RecipeSerializer(
+    SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer
+):
     favorites = FavoriteRecipeSerializer(many=True)
     ingredients = IngredientSerializer(many=True)
     pictures = RecipePictureSerializer(many=True)
     is_owner = serializers.SerializerMethodField()
     is_favorite = serializers.SerializerMethodField()
+    primary_picture = serializers.SerializerMethodField()
+    optional_fields = ("primary_picture",)  # only rendered when in ?fields=
 
     class Meta:
         model = Recipe
@@ -44,7 +84,9 @@ class RecipeSerializer(serializers.ModelSerializer):
             "is_owner",
             "ingredients",
             "pictures",
+            "primary_picture",
             "favorites",
+            "favorites_count",
             "is_favorite",
         )
         depth = 1
@@ -53,32 +95,72 @@ class RecipeSerializer(serializers.ModelSerializer):
         request = self.context.get("request", None)
         if request is None or request.user.is_anonymous:
             return False
-        return request.user == obj.user
+        if hasattr(obj, "is_owner"):
+            return obj.is_owner
+        return request.user.id == obj.user_id
 
     def get_is_favorite(self, obj):
         request = self.context.get("request", None)
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(obj, "is_favorite"):
+            return obj.is_favorite
         user = request.user
         return FavoriteRecipe.objects.filter(recipe=obj, user=user).exists()
 
+    def get_primary_picture(self, obj):
+        """Image URL of the picture list screens show, or None"""
+        ready = [
+            picture
+            for picture in obj.pictures.all()
+            if picture.status == RecipePicture.READY and picture.image
+        ]
+        if not ready:
+            return None
+        picture = next((p for p in ready if p.is_primary), ready[0])
+        request = self.context.get("request", None)
+        url = picture.image.url
+        return request.build_absolute_uri(url) if request is not None else url
+
+
+def my_recipes(user, fields=None):
+    """Recipes `user` owns or has favorited.
+
+    The ids come from a UNION of two index lookups, recipes by owner and
+    favorites by user, rather than an OR across a join to favorites that
+    then needs a DISTINCT.
+    """
+    owned = Recipe.objects.filter(user=user).values("pk")
+    favorited = FavoriteRecipe.objects.filter(user=user).values("recipe_id")
+    recipes = Recipe.objects.filter(pk__in=owned.union(favorited))
+    return recipes.with_details(user, fields)
 
-class RecipeView(viewsets.ViewSet):
+
+def favorite_recipes(user, fields=None):
+    favorites = FavoriteRecipe.objects.filter(user=user)
+    recipes = Recipe.objects.filter(pk__in=favorites.values("recipe"))
+    return recipes.with_details(user, fields)
+
+
+class RecipeView(ReplicaReadsMixin, viewsets.ViewSet):
     permission_classes = [
         IsAuthenticated
     ]  # Ensure the user is authenticated for all actions
+    replica_actions = ("list", "retrieve", "list_favorites", "list_my_recipes")
+
+    def paginated_response(self, request, recipes):
+        """Serialize one cursor page of recipes"""
+        paginator = IdCursorPagination()
+        page = paginator.paginate_queryset(recipes, request, view=self)
+        serialized = RecipeSerializer(page, many=True, context={"request": request})
+        return paginator.get_paginated_response(serialized.data)
 
     @action(detail=False, methods=["get"], url_path="my-recipes")
+    @cache_response(lambda request: my_recipes_scope(request.user.id))
     def list_my_recipes(self, request):
         """List all recipes owned by the logged-in user or favorited by the logged-in user"""
-        user = request.user
-        owned_recipes = Recipe.objects.filter(user=user)
-        favorited_recipes = Recipe.objects.filter(favorites__user=user)
-        all_recipes = owned_recipes | favorited_recipes
-        serialized = RecipeSerializer(
-            all_recipes.distinct(), many=True, context={"request": request}
-        )
-        return Response(serialized.data, status=status.HTTP_200_OK)
+        recipes = my_recipes(request.user, requested_fields(request))
+        return self.paginated_response(request, recipes)
 
     @action(detail=True, methods=["post"], url_path="favorite")
     def favorite(self, request, pk=None):
@@ -86,34 +168,289 @@ class RecipeView(viewsets.ViewSet):
         try:
             recipe = Recipe.objects.get(pk=pk)
             user = request.user
-            favorite, created = FavoriteRecipe.objects.get_or_create(
-                user=user, recipe=recipe
-            )
+            # the unique (user, recipe) constraint makes concurrent taps safe:
+            # get_or_create falls back to the existing row on a conflict
+            with transaction.atomic():
+                favorite, created = FavoriteRecipe.objects.get_or_create(
+                    user=user, recipe=recipe
+                )
+                if not created:
+                    favorite.delete()
 
             if not created:
-                favorite.delete()
                 return Response(
                     {"message": "Removed from favorites"},
                     status=status.HTTP_204_NO_CONTENT,
                 )
 
+            recipe.refresh_from_db(fields=["favorites_count"])
             serialized = RecipeSerializer(recipe)
             return Response(serialized.data, status=status.HTTP_201_CREATED)
         except Recipe.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
 
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path="pictures",
+        parser_classes=[MultiPartParser, FileUploadParser],
+    )
+    def upload_picture(self, request, pk=None):
+        """Attach an uploaded image, streamed to storage in chunks.
+
+        Accepts multipart/form-data with an "image" file (and optional
+        "is_primary"), or a raw image body with a Content-Disposition filename.
+        """
+        # must be installed before request.data is first read
+        size_limit = SizeLimitedUploadHandler(request)
+        request.upload_handlers.insert(0, size_limit)
+
+        try:
+            recipe = Recipe.objects.get(pk=pk)
+        except Recipe.DoesNotExist:
+            return Response(
+                {"error": "Recipe not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        if recipe.user_id != request.user.id:
+            raise PermissionDenied("You do not have permission to edit this recipe.")
+
+        try:
+            upload = request.data.get("image") or request.data.get("file")
+        except SkipFile:
+            # MultiPartParser drops a skipped file, FileUploadParser lets the
+            # handler's SkipFile escape; size_limit has recorded it either way
+            upload = None
+        if size_limit.exceeded:
+            return Response(
+                {"error": f"Images are limited to {size_limit.max_bytes} bytes"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        if upload is None:
+            return Response(
+                {"error": "An image file is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        ext = upload.name.split(".")[-1].lower()
+        if ext not in ["jpg", "jpeg", "png", "gif", "webp"]:
+            ext = "jpg"
+        upload.name = f"{recipe.id}-{uuid.uuid4()}.{ext}"
+        is_primary = str(request.data.get("is_primary", "")).lower() in ["1", "true"]
+        if is_primary:
+            RecipePicture.objects.filter(recipe=recipe).update(is_primary=False)
+        picture = RecipePicture.objects.create(
+            recipe=recipe, image=upload, is_primary=is_primary
+        )
+        serialized = RecipePictureSerializer(picture, context={"request": request})
+        return Response(serialized.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["get"], url_path="search")
+    def search(self, request):
+        """Full-text search over description and summary, best match first"""
+        query = request.query_params.get("q", "")
+        if not query.strip():
+            return Response(
+                {"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            rows, next_cursor = search_recipes(
+                query,
+                cursor=request.query_params.get("cursor"),
+                limit=IdCursorPagination().get_page_size(request),
+            )
+        except InvalidCursor as invalid:
+            return Response({"error": str(invalid)}, status=status.HTTP_400_BAD_REQUEST)
+
+        recipes = Recipe.objects.with_details(request.user).in_bulk(
+            [pk for pk, _, _ in rows]
+        )
+        rows = [row for row in rows if row[0] in recipes]
+        serialized = RecipeSerializer(
+            [recipes[pk] for pk, _, _ in rows], many=True, context={"request": request}
+        )
+        results = [
+            {**data, "snippet": snippet, "score": score}
+            for data, (_, score, snippet) in zip(serialized.data, rows)
+        ]
+
+        next_url = None
+        if next_cursor:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), "cursor", next_cursor
+            )
+        return Response({"next": next_url, "results": results})
+
+    @action(detail=False, methods=["get"], url_path="by-ingredients")
+    def by_ingredients(self, request):
+        """Recipes ranked by how much of each one the given ingredients cover.
+
+        Takes ?ingredients=1,2,3 (or repeated ingredients= params) and ?limit=.
+        """
+        try:
+            pantry = {
+                int(pk)
+                for value in request.query_params.getlist("ingredients")
+                for pk in value.split(",")
+                if pk.strip()
+            }
+            limit = max(1, min(int(request.query_params.get("limit", 20)), 100))
+        except ValueError:
+            return Response(
+                {"error": "ingredients and limit must be numbers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        ranked = pantry_index.rank(pantry, limit)
+        recipes = Recipe.objects.with_details(request.user).in_bulk(
+            [recipe_id for recipe_id, _, _ in ranked]
+        )
+        ranked = [row for row in ranked if row[0] in recipes]
+        serialized = RecipeSerializer(
+            [recipes[recipe_id] for recipe_id, _, _ in ranked],
+            many=True,
+            context={"request": request},
+        )
+        results = [
+            {
+                **data,
+                "coverage": matched / total,
+                "matched": matched,
+                "missing": total - matched,
+            }
+            for data, (_, matched, total) in zip(serialized.data, ranked)
+        ]
+        return Response(results, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["get"], url_path="similar")
+    def similar(self, request, pk=None):
+        """Recipes with the most similar ingredient sets, most similar first"""
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 10)), 50))
+        except ValueError:
+            return Response(
+                {"error": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if not Recipe.objects.filter(pk=pk).exists():
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        ranked = similar_recipes(pk, limit)
+        recipes = Recipe.objects.with_details(request.user).in_bulk(
+            [recipe_id for recipe_id, _ in ranked]
+        )
+        ranked = [row for row in ranked if row[0] in recipes]
+        serialized = RecipeSerializer(
+            [recipes[recipe_id] for recipe_id, _ in ranked],
+            many=True,
+            context={"request": request},
+        )
+        results = [
+            {**data, "similarity": similarity}
+            for data, (_, similarity) in zip(serialized.data, ranked)
+        ]
+        return Response(results, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """Create and update many recipes in one transaction.
+
+        Takes a list of recipes; an item with an "id" updates that recipe.
+        Every item is validated before anything is written, so either all of
+        them are saved or none are. Images are not accepted here; upload them
+        to /recipes/<id>/pictures afterwards.
+        """
+        if not isinstance(request.data, list):
+            return Response(
+                {"error": "Expected a list of recipes"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        max_items = getattr(settings, "BULK_RECIPE_MAX_ITEMS", 5000)
+        if len(request.data) > max_items:
+            return Response(
+                {"error": f"At most {max_items} recipes per request"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        items, errors = validate_items(request.user, request.data)
+        if errors:
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+        results = write_items(request.user, items)
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"], url_path="favorites/batch")
+    def favorite_batch(self, request):
+        """Add and remove many favorites in one transaction.
+
+        Takes {"add": [recipe ids], "remove": [recipe ids]}. Adding an existing
+        favorite or removing a missing one is a no-op, so retries are safe.
+        """
+        invalid = Response(
+            {"error": "add and remove must be lists of recipe ids"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+        if not isinstance(request.data, dict):
+            return invalid
+        add, remove = request.data.get("add", []), request.data.get("remove", [])
+        if not isinstance(add, list) or not isinstance(remove, list):
+            return invalid
+        try:
+            to_add = {int(pk) for pk in add}
+            to_remove = {int(pk) for pk in remove}
+        except (TypeError, ValueError):
+            return invalid
+        if to_add & to_remove:
+            return Response(
+                {"error": "A recipe cannot be both added and removed"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        requested = to_add | to_remove
+        found = set(
+            Recipe.objects.filter(pk__in=requested).values_list("id", flat=True)
+        )
+        if requested - found:
+            return Response(
+                {"error": "Recipes not found", "ids": sorted(requested - found)},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        user = request.user
+        with transaction.atomic():
+            FavoriteRecipe.objects.filter(user=user, recipe_id__in=to_remove).delete()
+            FavoriteRecipe.objects.bulk_create(
+                [FavoriteRecipe(user=user, recipe_id=pk) for pk in to_add],
+                ignore_conflicts=True,
+            )
+            # bulk_create skips the signals that maintain the counts
+            Recipe.objects.filter(pk__in=requested).recount_favorites()
+        invalidate_recipes(requested, [user.id])
+
+        counts = Recipe.objects.filter(pk__in=requested).values_list(
+            "id", "favorites_count"
+        )
+        return Response(
+            {
+                "favorites": sorted(
+                    FavoriteRecipe.objects.filter(
+                        user=user, recipe_id__in=requested
+                    ).values_list("recipe_id", flat=True)
+                ),
+                "favorites_count": {pk: count for pk, count in counts},
+            },
+            status=status.HTTP_200_OK,
+        )
+
     @action(detail=False, methods=["get"], url_path="favorites")
     def list_favorites(self, request):
         """List all favorite recipes for the logged-in user"""
-        favorite_recipes = FavoriteRecipe.objects.filter(user=request.user)
-        recipes = [favorite.recipe for favorite in favorite_recipes]
-        serialized = RecipeSerializer(recipes, many=True)
-        return Response(serialized.data, status=status.HTTP_200_OK)
+        recipes = favorite_recipes(request.user, requested_fields(request))
+        return self.paginated_response(request, recipes)
 
+    @cache_response(lambda request, pk=None: recipe_scope(pk))
     def retrieve(self, request, pk=None):
         try:
-            recipe = Recipe.objects.get(pk=pk)
-            if recipe.user != request.user:
+            recipe = Recipe.objects.with_details(
+                request.user, requested_fields(request)
+            ).get(pk=pk)
+            if recipe.user_id != request.user.id:
                 raise PermissionDenied(
                     "You do not have permission to view this recipe."
                 )
@@ -124,9 +461,8 @@ class RecipeView(viewsets.ViewSet):
             return Response(status=status.HTTP_404_NOT_FOUND)
 
     def list(self, request):
-        recipes = Recipe.objects.all()
-        serialized = RecipeSerializer(recipes, many=True, context={"request": request})
-        return Response(serialized.data, status=status.HTTP_200_OK)
+        recipes = Recipe.objects.with_details(request.user, requested_fields(request))
+        return self.paginated_response(request, recipes)
 
     def destroy(self, request, pk=None):
         try:
@@ -160,35 +496,16 @@ class RecipeView(viewsets.ViewSet):
             user=request.user, description=description, summary=summary  # Add summary
         )
 
-        if isinstance(ingredients_data[0], int):
+        if ingredients_data and isinstance(ingredients_data[0], int):
             new_recipe.ingredients.set(ingredients_data)
         else:
-            ingredient_ids = []
-            for ingredient_data in ingredients_data:
-                name = ingredient_data.get("name", "").strip()
-                if name:
-                    ingredient, created = Ingredient.objects.get_or_create(name=name)
-                    ingredient_ids.append(ingredient.id)
-            new_recipe.ingredients.set(ingredient_ids)
-
-        for image_url in images:
-            try:
-                response = requests.get(
-                    image_url, headers={"User-Agent": "Mozilla/5.0"}
-                )
-                response.raise_for_status()
-                image_content = response.content
-
-                ext = image_url.split(".")[-1].lower()
-                if ext not in ["jpg", "jpeg", "png", "gif"]:
-                    ext = "jpg"
-
-                file_name = f"{new_recipe.id}-{uuid.uuid4()}.{ext}"
-                data = ContentFile(image_content, name=file_name)
+            names = [data.get("name", "") for data in ingredients_data]
+            new_recipe.ingredients.set(Ingredient.objects.resolve_names(names))
+        refresh_signatures([new_recipe.id])
 
-                RecipePicture.objects.create(recipe=new_recipe, image=data)
-            except requests.exceptions.RequestException as e:
-                print(f"Error downloading or processing image: {e}")
+        # Images are downloaded by the process_image_jobs worker; until then
+        # each one is a picture slot with status "pending"
+        enqueue_images(new_recipe, images)
 
         serialized_recipe = RecipeSerializer(new_recipe, context={"request": request})
         return Response(serialized_recipe.data, status=status.HTTP_201_CREATED)
@@ -210,22 +527,25 @@ class RecipeView(viewsets.ViewSet):
             if summary:
                 recipe.summary = summary  # Add summary
 
-            ingredient_ids = request.data.get("ingredients", None)
-            if ingredient_ids is not None:
-                recipe.ingredients.set(ingredient_ids)
-
-            RecipePicture.objects.filter(recipe=recipe).delete()
-
+            # decode (and size-check) the new picture before changing anything
             images = request.data.get("images", [])
+            data = None
             if images:
-                img = images[0]
-                format, imgstr = img.split(";base64,")
-                ext = format.split("/")[-1]
-                file_name = f"{recipe.id}-{uuid.uuid4()}.{ext}"
-                data = ContentFile(base64.b64decode(imgstr), name=file_name)
-                RecipePicture.objects.create(recipe=recipe, image=data, is_primary=True)
-
-            recipe.save()
+                data = decode_data_url(images[0], f"{recipe.id}-{uuid.uuid4()}")
+
+            with transaction.atomic():
+                ingredient_ids = request.data.get("ingredients", None)
+                if ingredient_ids is not None:
+                    recipe.ingredients.set(ingredient_ids)
+                    refresh_signatures([recipe.id])
+
+                RecipePicture.objects.filter(recipe=recipe).delete()
+                if data is not None:
+                    RecipePicture.objects.create(
+                        recipe=recipe, image=data, is_primary=True
+                    )
+
+                recipe.save()
             serialized_recipe = RecipeSerializer(recipe, context={"request": request})
             return Response(serialized_recipe.data, status=status.HTTP_200_OK)
 
@@ -237,5 +557,10 @@ class RecipeView(viewsets.ViewSet):
             return Response(
                 {"error": str(permission_denied)}, status=status.HTTP_403_FORBIDDEN
             )
+        except UploadTooLarge as too_large:
+            return Response(
+                {"error": str(too_large)},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
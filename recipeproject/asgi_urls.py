@@ -0,0 +1,38 @@
+"""URLconf for requests served over ASGI (see ASYNC_URLCONF).
+
+The recipe and ingredient GET routes run as async views; every other route,
+and every other method on these URLs, is served by recipeproject.urls.
+"""
+
+from django.urls import path
+from recipeapi.views.async_views import AsyncIngredientView, AsyncRecipeView
+from recipeproject.urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path("recipes", AsyncRecipeView.as_view(action="list"), name="recipe-list"),
+    path(
+        "recipes/my-recipes",
+        AsyncRecipeView.as_view(action="list_my_recipes"),
+        name="recipe-list-my-recipes",
+    ),
+    path(
+        "recipes/favorites",
+        AsyncRecipeView.as_view(action="list_favorites"),
+        name="recipe-list-favorites",
+    ),
+    path(
+        "recipes/<int:pk>",
+        AsyncRecipeView.as_view(action="retrieve"),
+        name="recipe-detail",
+    ),
+    path(
+        "ingredients",
+        AsyncIngredientView.as_view(action="list"),
+        name="ingredient-list",
+    ),
+    path(
+        "ingredients/<int:pk>",
+        AsyncIngredientView.as_view(action="retrieve"),
+        name="ingredient-detail",
+    ),
+] + sync_urlpatterns
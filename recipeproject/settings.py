@@ -43,12 +43,22 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.TokenAuthentication",
+        "recipeapi.authentication.CachedTokenAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    # default paginator and page size for the cursor-paginated list endpoints
+    "DEFAULT_PAGINATION_CLASS": "recipeapi.pagination.IdCursorPagination",
+    "PAGE_SIZE": 50,
+    "DEFAULT_RENDERER_CLASSES": [
+        "recipeapi.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
 }
+# ORJSONRenderer encodes with orjson (when installed) instead of the stdlib
+# json module; the bytes are the same, produced several times faster
+ORJSON_RENDERING = True
 
 CORS_ORIGIN_WHITELIST = (
     "http://localhost:3000",
@@ -61,6 +71,9 @@ CORS_ORIGIN_WHITELIST = (
 
 
 MIDDLEWARE = [
+    # first, so its timings cover the rest of the stack
+    "recipeapi.metrics.RequestMetricsMiddleware",
+    "recipeapi.profiling.RequestProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -69,9 +82,15 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # last, so it only runs when the server is ASGI
+    "recipeapi.async_routing.AsyncURLConfMiddleware",
 ]
 
 ROOT_URLCONF = "recipeproject.urls"
+# Requests served over ASGI (manage.py runasgi) resolve here instead, which
+# swaps async views in for the recipe and ingredient GET routes. None serves
+# ASGI from ROOT_URLCONF too.
+ASYNC_URLCONF = "recipeproject.asgi_urls"
 
 TEMPLATES = [
     {
@@ -95,13 +114,83 @@ WSGI_APPLICATION = "recipeproject.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
+# Tuned for serving traffic from one SQLite file:
+# - WAL lets readers run while a write commits; synchronous=NORMAL is still
+#   crash-safe in WAL mode and skips an fsync per commit.
+# - busy_timeout makes a writer wait for the lock instead of failing at once,
+#   and BEGIN IMMEDIATE takes that lock when a transaction starts, so a
+#   transaction never has to upgrade a read lock (which cannot wait).
+# - mmap_size and cache_size (negative = KiB) keep hot pages in memory.
+# - Connections persist for CONN_MAX_AGE seconds and are checked before reuse.
+# - recipeapi.sqlite_backend runs the pragmas on each new connection, starts
+#   transactions with BEGIN IMMEDIATE, and retries statements that still hit
+#   "database is locked" (lock_retries times, backing off from
+#   lock_retry_delay seconds).
+SQLITE_PRAGMAS = [
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+]
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "recipeapi.sqlite_backend",
         "NAME": BASE_DIR / "db.sqlite3",
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "pragmas": SQLITE_PRAGMAS,
+            "lock_retries": 5,
+            "lock_retry_delay": 0.05,
+        },
     }
 }
 
+# Read replicas: aliases in DATABASES holding copies of "default". The read
+# actions of RecipeView and IngredientView (see ReplicaReadsMixin) spread
+# over them; writes always go to "default". After a successful write, that
+# user's reads stay on "default" for READ_YOUR_WRITES_WINDOW seconds so they
+# see their own change while replicas catch up. The pin lives in the
+# "default" cache, which must be shared when running several workers.
+# With no replicas, everything reads from "default". For example:
+#   DATABASES["replica"] = {**DATABASES["default"], "NAME": "/srv/replica.sqlite3"}
+#   DATABASE_REPLICAS = ["replica"]
+DATABASE_ROUTERS = ["recipeapi.db_router.ReplicaRouter"]
+DATABASE_REPLICAS = []
+READ_YOUR_WRITES_WINDOW = 5  # seconds
+
+
+# Caches
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+#
+# "responses" holds rendered recipe reads and their version tokens. Local
+# memory is per process; with several workers, point it at a shared backend
+# (e.g. FileBasedCache) so signal-driven invalidation reaches all of them.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "responses": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "recipe-responses",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+RESPONSE_CACHE_ALIAS = "responses"
+RESPONSE_CACHE_TIMEOUT = 300  # seconds
+
+
+# CachedTokenAuthentication: token -> user entries live this many seconds, in
+# an in-process LRU of TOKEN_AUTH_CACHE_SIZE entries unless TOKEN_AUTH_CACHE_ALIAS
+# names a shared cache
+TOKEN_AUTH_CACHE_TTL = 60
+TOKEN_AUTH_CACHE_SIZE = 10000
+TOKEN_AUTH_CACHE_ALIAS = None
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -139,6 +228,54 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Remote image downloads
+IMAGE_FETCH_WORKERS = 8
+IMAGE_FETCH_TIMEOUT = 5  # seconds per connect/read
+IMAGE_FETCH_TOTAL_TIMEOUT = 15  # seconds for one whole download
+IMAGE_FETCH_MAX_BYTES = 10 * 1024 * 1024
+
+# Direct image uploads (POST /recipes/<id>/pictures and base64 in updates)
+IMAGE_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+
+# Largest list accepted by POST /recipes/bulk
+BULK_RECIPE_MAX_ITEMS = 5000
+
+# Background image ingestion (manage.py process_image_jobs)
+IMAGE_JOB_MAX_ATTEMPTS = 5
+IMAGE_JOB_RETRY_DELAY = 30  # seconds, doubled after each failed attempt
+IMAGE_JOB_LOCK_TIMEOUT = 300  # seconds before a running job is reclaimed
+
+# Seconds before the in-process ingredient search index is rebuilt, picking
+# up bulk inserts and changes made by other worker processes
+INGREDIENT_INDEX_TTL = 60
+
+# Same, for the ingredient -> recipes index behind /recipes/by-ingredients
+PANTRY_INDEX_TTL = 60
+
+# Request metrics: Server-Timing headers and the histograms behind /metrics.
+# With METRICS_LOG_SLOW_QUERIES on, queries slower than METRICS_SLOW_QUERY_MS
+# are logged to "recipeapi.metrics" with their SQL and stack trace.
+# /metrics is served to staff users and to requests carrying
+# "Authorization: Bearer <METRICS_TOKEN>" (for scrapers); None allows staff only.
+METRICS_ENABLED = True
+METRICS_LOG_SLOW_QUERIES = False
+METRICS_SLOW_QUERY_MS = 100
+METRICS_TOKEN = None
+
+# On-demand request profiling. Requests carrying an X-Profile header from
+# `manage.py profile_token` (valid PROFILING_TOKEN_MAX_AGE seconds), plus a
+# PROFILING_SAMPLE_RATE fraction of all requests, are profiled into
+# PROFILING_DIR, keeping the newest PROFILING_MAX_FILES. PROFILING_PROFILER
+# ("cprofile" -> .prof, "sampling" -> collapsed stacks) applies to sampled
+# requests. While disabled the middleware is not loaded at all.
+PROFILING_ENABLED = False
+PROFILING_SAMPLE_RATE = 0.0
+PROFILING_PROFILER = "cprofile"
+PROFILING_SAMPLE_INTERVAL = 0.001  # seconds between stack samples
+PROFILING_DIR = BASE_DIR / "profiles"
+PROFILING_MAX_FILES = 200
+PROFILING_TOKEN_MAX_AGE = 3600
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
@@ -3,7 +3,7 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 from django.conf import settings
 from django.conf.urls.static import static
-from recipeapi.views import UserViewSet
+from recipeapi.views import UserViewSet, metrics, picture_variant
 from recipeapi.views.recipe_view import RecipeView
 from recipeapi.views.ingredient_view import IngredientView
 
@@ -19,4 +19,10 @@ urlpatterns = [
     ),
     path("recipes/<int:pk>/favorite", RecipeView.as_view({"post": "favorite"})),
     path("recipes/favorites", RecipeView.as_view({"get": "list_favorites"})),
+    path(
+        "recipes/pictures/<int:pk>/<int:width>.<str:fmt>",
+        picture_variant,
+        name="picture-variant",
+    ),
+    path("metrics", metrics, name="metrics"),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)